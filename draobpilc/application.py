@@ -35,9 +35,11 @@ from draobpilc.processors import (
 )
 from draobpilc.lib import utils
 from draobpilc.lib import gpaste_client
+from draobpilc.lib import history_backend
 from draobpilc.history_item import HistoryItem
 from draobpilc.history_item_kind import HistoryItemKind
-from draobpilc.history_items import HistoryItems
+from draobpilc.history_items import HistoryItems, RegexSearchState
+from draobpilc.histories_search import HistoriesSearch
 from draobpilc.widgets import shortcuts_window
 from draobpilc.widgets.window import Window
 from draobpilc.widgets.search_box import SearchBox
@@ -71,7 +73,12 @@ class Application(Gtk.Application):
         gtk_settings = Gtk.Settings.get_default()
         gtk_settings.props.gtk_application_prefer_dark_theme = True
 
+        self._backend = history_backend.get_default()
         self._window = None
+        self._window_ready = False
+        self._prepare_window_id = 0
+        # the selection is restored when deleted items are gone
+        self._resume_selection = False
         self._editor = editor.Editor()
         self._previewer = previewer.Previewer()
         self._merger = merger.Merger()
@@ -100,10 +107,10 @@ class Application(Gtk.Application):
             lambda b: self.hide(reset_search=True)
         )
         self._main_toolbox.track_btn.connect('clicked',
-            lambda b: gpaste_client.track(b.get_active())
+            lambda b: self._backend.track(b.get_active())
         )
         self._main_toolbox.track_btn.set_active(
-            gpaste_client.get_prop('Active')
+            self._backend.get_prop('Active')
         )
         self._main_toolbox.help_btn.connect(
             'clicked',
@@ -111,13 +118,31 @@ class Application(Gtk.Application):
         )
 
         self._history_items = HistoryItems()
+        self._history_items.set_hidden(True)
+        # blinker keeps weak references, lambdas would be collected
+        self._history_items.connect('changed', self._on_history_changed)
+        self._history_items.connect('thawed', self._on_history_thawed)
+        self._history_items.connect('regex-state', self._on_regex_state)
+
+        self._histories_search = HistoriesSearch()
+        self._histories_search.connect(
+            'results',
+            self._on_histories_search_results
+        )
+        self._histories_search.connect(
+            'running',
+            self._on_histories_search_running
+        )
 
         self._search_box = SearchBox()
         self._search_box.connect('search-changed',
             self._on_search_changed
         )
         self._search_box.connect('search-index',
-            lambda sb, i: self._on_search_changed(sb, search_index=i)
+            lambda sb, first, last: self._on_search_changed(
+                sb,
+                search_index=range(first, last + 1)
+            )
         )
         self._search_box.entry.connect('activate',
             self._on_entry_activated
@@ -142,8 +167,8 @@ class Application(Gtk.Application):
         )
         self._items_view.bind(self._history_items)
 
-        gpaste_client.connect('ShowHistory', self.toggle)
-        gpaste_client.connect('Tracking',
+        self._backend.connect('ShowHistory', self.toggle)
+        self._backend.connect('Tracking',
             lambda t: self._main_toolbox.track_btn.set_active(t)
         )
         common.APPLICATION = self
@@ -178,19 +203,77 @@ class Application(Gtk.Application):
         self._previewer.set_max_size(processors_width, processors_height)
 
     def _on_search_changed(self, search_box, search_index=None):
+        pattern = self._search_box.regex
+
+        if pattern is not None and search_index is None:
+            self._histories_search.cancel()
+            self._history_items.filter_regex(pattern, self._search_box.flags)
+            return
+
         self._history_items.filter(
             term=self._search_box.search_text,
             kinds=self._search_box.flags,
             index=search_index
         )
 
+        if self._search_box.all_histories and search_index is None:
+            self._histories_search.search(
+                self._search_box.search_text,
+                self._search_box.flags
+            )
+        else:
+            self._histories_search.cancel()
+
+    def _on_history_changed(self, history_items):
+        self._schedule_prepare_window()
+
+    def _on_histories_search_results(self, histories_search, items):
+        self._history_items.merge_results(items)
+
+    def _on_histories_search_running(self, histories_search, running):
+        if running: self._search_box.spinner.start()
+        else: self._search_box.spinner.stop()
+
+    def _on_regex_state(self, history_items, state, message):
+        if state == RegexSearchState.RUNNING: self._search_box.spinner.start()
+        else: self._search_box.spinner.stop()
+
+        if state == RegexSearchState.TIMED_OUT:
+            self._search_box.set_status(
+                _('The search took too long, the results are partial')
+            )
+        elif state == RegexSearchState.ERROR:
+            self._search_box.set_status(message)
+        else:
+            self._search_box.set_status(None)
+
     def _on_entry_activated(self, entry):
         items = self._items_view.get_selected()
         if items: self._on_item_activated(self._items_view, items[0])
         return True
 
     def _on_item_activated(self, items_view, history_item):
-        gpaste_client.select(history_item.index)
+        if history_item.history_name is not None:
+            self._activate_from_history(history_item)
+            return
+
+        self._history_items.flush_updates()
+        self._backend.select(history_item.index)
+        self._search_box.entry.set_text('')
+        self.hide()
+
+    def _activate_from_history(self, history_item):
+        """ switches to the item's history and selects it there """
+        self._backend.switch_history(history_item.history_name)
+
+        try:
+            index = self._backend.get_raw_history().index(history_item.raw)
+        except ValueError:
+            # gone since the history was read
+            pass
+        else:
+            self._backend.select(index)
+
         self._search_box.entry.set_text('')
         self.hide()
 
@@ -199,7 +282,7 @@ class Application(Gtk.Application):
 
         self._items_processors.set_items(
             [item],
-            timeout=common.SETTINGS[common.SET_ITEMS_TIMEOUT]
+            timeout=common.SNAPSHOT.set_items_timeout
         )
 
     def _on_delete_action(self, action, param):
@@ -223,7 +306,7 @@ class Application(Gtk.Application):
 
     def _restart_daemon(self, button):
         try:
-            gpaste_client.reexecute()
+            self._backend.reexecute()
         except DBusException:
             pass
 
@@ -300,36 +383,52 @@ class Application(Gtk.Application):
         selected = self._items_view.get_selected()
         self._items_processors.set_items(
             selected,
-            timeout=common.SETTINGS[common.SET_ITEMS_TIMEOUT]
+            timeout=common.SNAPSHOT.set_items_timeout
         )
 
     def delete_items(self, items, resume_selection=True):
+        # results from other histories can't be deleted from here
+        items = [item for item in items if item.history_name is None]
+        if not items: return
+
+        self._history_items.flush_updates()
         delete_indexes = [item.index for item in items]
         delete_indexes = sorted(delete_indexes)
 
         self._history_items.freeze(True)
-        if resume_selection: self._items_view.save_selection()
+        if resume_selection:
+            self._items_view.save_selection()
+            self._resume_selection = True
+
+        n_deleted = 0
 
         for i, index in enumerate(delete_indexes):
             delete_index = index - i
             if delete_index < 0: continue
-            gpaste_client.delete(delete_index)
+            self._backend.delete(delete_index)
+            n_deleted += 1
+
+        # the rows change when the Update signals of the deletes
+        # arrive, see _on_history_thawed()
+        self._history_items.freeze(False, expected_updates=n_deleted)
 
+    def _on_history_thawed(self, history_items):
         filter_active = self._search_box.search_text or self._search_box.flags
-        self._history_items.freeze(False)
-        self._history_items.reload_history(emit_signal=not filter_active)
 
-        if filter_active:
+        # a full reload drops the filter
+        if filter_active and not self._history_items.filter_mode:
             self._on_search_changed(self._search_box)
 
-        if resume_selection: self._items_view.resume_selection()
+        if self._resume_selection:
+            self._resume_selection = False
+            self._items_view.resume_selection()
 
     def merge_items(self, merger, items, delete_merged):
         merged_text = self._merger.buffer.props.text
         if not merged_text: return
 
         if delete_merged: self.delete_items(items, resume_selection=False)
-        gpaste_client.add(merged_text)
+        self._backend.add(merged_text)
         self.hide()
 
     def do_command_line(self, command_line):
@@ -343,12 +442,7 @@ class Application(Gtk.Application):
         
         return 0
 
-    def do_activate(self, show_preferences_dialog=False):
-        if self._window:
-            if show_preferences_dialog: show_preferences()
-            else: self.show()
-            return None
-
+    def _build_window(self):
         right_box = Gtk.Box()
         right_box.set_name('RightBox')
         right_box.set_orientation(Gtk.Orientation.VERTICAL)
@@ -367,6 +461,46 @@ class Application(Gtk.Application):
         self._window.grid.attach(self._main_toolbox, 0, 1, 1, 1)
         self._window.grid.attach(right_box, 1, 0, 1, 2)
 
+    def _prepare_window(self):
+        if not self._window: self._build_window()
+        if self._window.get_visible(): return
+
+        # apply the changes, fill the rows, select the first one,
+        # realize and measure everything while hidden, so the next
+        # show() only has to map the window
+        self._history_items.flush_updates()
+        self._items_view.refresh()
+        self._window.grid.show_all()
+        self._window.realize()
+        self._window.get_preferred_size()
+        self._items_view.select_first()
+        self._window_ready = True
+
+    def _on_prepare_window(self):
+        # still set while preparing, changes applied there
+        # don't schedule another run
+        self._prepare_window()
+        self._prepare_window_id = 0
+        return GLib.SOURCE_REMOVE
+
+    def _schedule_prepare_window(self):
+        if self._prepare_window_id: return
+        if self._window and self._window.get_visible(): return
+
+        self._prepare_window_id = GLib.idle_add(
+            self._on_prepare_window,
+            priority=GLib.PRIORITY_LOW
+        )
+
+    def do_activate(self, show_preferences_dialog=False):
+        if self._window:
+            if show_preferences_dialog: show_preferences()
+            else: self.show()
+            return None
+
+        self._build_window()
+        self._schedule_prepare_window()
+
         if show_preferences_dialog: show_preferences()
 
     def do_startup(self):
@@ -458,8 +592,14 @@ class Application(Gtk.Application):
                 )
             ))
 
+    def do_shutdown(self):
+        self._histories_search.shutdown()
+        self._history_items.shutdown()
+        self._history_items.save_search_index()
+        Gtk.Application.do_shutdown(self)
+
     def toggle(self):
-        if self._window.props.visible:
+        if self._window and self._window.props.visible:
             self.hide()
         else:
             self.show()
@@ -477,7 +617,19 @@ class Application(Gtk.Application):
         about_dialog.show()
 
     def show(self):
-        self._window.show_all()
+        # usually done in the background already, unless the hotkey
+        # came before the idle did
+        self._history_items.flush_updates()
+
+        if self._prepare_window_id or not self._window_ready:
+            if self._prepare_window_id:
+                GLib.source_remove(self._prepare_window_id)
+                self._prepare_window_id = 0
+
+            self._prepare_window()
+
+        self._history_items.set_hidden(False)
+        self._window.show()
         self._window.maximize()
         self._window.get_window().focus(Gdk.CURRENT_TIME)
         self._window.present_with_time(Gdk.CURRENT_TIME)
@@ -491,8 +643,10 @@ class Application(Gtk.Application):
             self._search_box.entry.grab_focus()
             grab_focus = False
 
-        self._items_view.select_first(grab_focus=grab_focus)
+        if grab_focus: self._items_view.focus_selected()
 
     def hide(self, reset_search=True):
         self._window.hide()
         if reset_search: self._search_box.reset()
+        self._history_items.set_hidden(True)
+        self._schedule_prepare_window()
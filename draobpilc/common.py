@@ -15,6 +15,10 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import os
+
+from gi.repository import GLib
+
 from draobpilc import get_data_path
 from draobpilc import version
 from draobpilc.lib import utils
@@ -30,6 +34,8 @@ SETTINGS = utils.get_settings(
 
 ICON_PATH = get_data_path('draobpilc.png')
 CSS_PATH = get_data_path('style.css')
+CACHE_DIR = os.path.join(GLib.get_user_cache_dir(), 'draobpilc')
+SEARCH_INDEX_PATH = os.path.join(CACHE_DIR, 'search-index')
 
 # settings keys
 WIDTH_PERCENTS = 'width-percents'
@@ -74,6 +80,55 @@ SHOW_CLIPBOARD_PREVIEW = 'show-clipboard-preview'
 ITEMS_VIEW_LIMIT = 'items-view-limit'
 LOAD_ALL_HISTORY = 'load-all-history'
 ENABLE_ACTIVATE_NUMBER_KB = 'enable-activate-number-kb'
+UPDATE_TIMEOUT_MS = 'update-timeout-ms'
+SEARCH_WORKERS = 'search-workers'
+SHARDED_SEARCH_MIN_ITEMS = 'sharded-search-min-items'
+REGEX_SEARCH_TIMEOUT_MS = 'regex-search-timeout-ms'
+
+
+class SettingsSnapshot():
+    """
+    Plain attribute copies of the settings read in hot paths, kept up
+    to date by the "changed" signal. Attributes are named after the
+    keys: SNAPSHOT.max_filter_results is SETTINGS[MAX_FILTER_RESULTS]
+    without a dconf lookup.
+    """
+
+    def __init__(self, settings, keys):
+        self._settings = settings
+        # key -> type
+        self._keys = dict(keys)
+
+        # GSettings only reports changes of keys read after connecting
+        self._settings.connect('changed', self._on_changed)
+        for key in self._keys: self._load(key)
+
+    def _load(self, key):
+        value = self._keys[key](self._settings[key])
+        setattr(self, key.replace('-', '_'), value)
+
+    def _on_changed(self, settings, key):
+        if key in self._keys: self._load(key)
+
+
+SNAPSHOT = SettingsSnapshot(SETTINGS, {
+    WIDTH_PERCENTS: int,
+    ITEM_MAX_LINES: int,
+    ITEM_MAX_HEIGHT: int,
+    KIND_INDICATOR_WIDTH: int,
+    SHOW_INDEXES: bool,
+    SHOW_THUMBNAILS: bool,
+    SEARCH_TIMEOUT: int,
+    SET_ITEMS_TIMEOUT: int,
+    FUZZY_SEARCH_MAX_DISTANCE: int,
+    MAX_FILTER_RESULTS: int,
+    ITEMS_VIEW_LIMIT: int,
+    UPDATE_TIMEOUT_MS: int,
+    SEARCH_WORKERS: int,
+    SHARDED_SEARCH_MIN_ITEMS: int,
+    REGEX_SEARCH_TIMEOUT_MS: int
+})
+
 
 SHORTCUTS_KEYS = {
     SHOW_HISTORIES: _('Show histories'),
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+
+# Copyright 2016 Ivan awamper@gmail.com
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# Search over the histories that aren't active. They are read from
+# disk and indexed on a worker thread, at startup, when the active
+# history changes and before every search, cached per history until
+# GPaste rewrites them, and searched on the same thread. Results are
+# handed back to the main loop as HistoryItems labelled with their
+# history.
+
+import logging
+import concurrent.futures
+
+from xml.etree.ElementTree import ParseError
+
+from gi.repository import GLib
+
+from draobpilc import common
+from draobpilc.lib import fuzzy
+from draobpilc.lib import analyzer
+from draobpilc.lib import trigram_index
+from draobpilc.lib import history_backend
+from draobpilc.lib.signals import Emitter
+from draobpilc.history_item import HistoryItem, get_display_budget
+
+
+class HistoryCache():
+    """ entries of one stored history and their search index """
+
+    def __init__(self, name, stamp, entries):
+        self.name = name
+        self.stamp = stamp
+        self.entries = entries
+        self._index = trigram_index.TrigramIndex()
+        # fuzzy.fold() of the entry texts
+        self.folded = []
+        # analyzer.Analysis of the entries, made on first use
+        self._analyses = [None] * len(entries)
+        # search index document id -> positions in entries
+        self._positions = {}
+
+        for position, (kind, raw, text) in enumerate(entries):
+            self.folded.append(fuzzy.fold(text))
+            doc_id = self._index.add(text)
+            self._positions.setdefault(doc_id, []).append(position)
+
+        self._index.index_pending()
+
+    def get_analysis(self, position):
+        analysis = self._analyses[position]
+
+        if analysis is None:
+            kind, raw, text = self.entries[position]
+            analysis = analyzer.analyze(kind, raw)
+            self._analyses[position] = analysis
+
+        return analysis
+
+    def get_candidates(self, term, contiguous=False):
+        doc_ids = self._index.get_candidates(term, contiguous)
+        if doc_ids is None: return range(len(self.entries))
+
+        return sorted(
+            position
+            for doc_id in doc_ids
+            for position in self._positions[doc_id]
+        )
+
+
+class HistoriesSearch(Emitter):
+
+    def __init__(self):
+        super().__init__()
+
+        # history name -> HistoryCache, only replaced by the worker
+        self._caches = {}
+        self._executor = None
+        # bumped on every search, older results are dropped
+        self._generation = 0
+        self._n_running = 0
+
+        self.add_signal('results')
+        self.add_signal('running')
+
+        self._backend = history_backend.get_default()
+        self._backend.connect('SwitchHistory', self._on_histories_changed)
+        self._backend.connect('DeleteHistory', self._on_histories_changed)
+        # indexed before the first search needs them
+        GLib.idle_add(self._on_preload, priority=GLib.PRIORITY_LOW)
+
+    def _on_preload(self):
+        self.preload()
+        return GLib.SOURCE_REMOVE
+
+    def _on_histories_changed(self, name):
+        self.preload()
+
+    def _get_names(self):
+        active_name = self._backend.get_history_name()
+
+        return [
+            name
+            for name in self._backend.list_histories()
+            if name != active_name
+        ]
+
+    def _submit(self, func, *args):
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=1
+            )
+
+        return self._executor.submit(func, *args)
+
+    def _load(self, names):
+        """ worker thread """
+        caches = {}
+
+        for name in names:
+            try:
+                stamp = self._backend.get_history_stamp(name)
+                cache = self._caches.get(name, None)
+
+                if stamp is None:
+                    continue
+                elif cache is None or cache.stamp != stamp:
+                    entries = self._backend.read_history(name)
+                    cache = HistoryCache(name, stamp, entries)
+            except (OSError, ParseError) as e:
+                logging.warning('Can\'t read history "%s": %s', name, e)
+                continue
+
+            caches[name] = cache
+
+        self._caches = caches
+
+    def _search(self, generation, term, kinds, max_distance, limit):
+        """
+        worker thread, returns a list of (score, name, position, entry,
+        match, analysis) or None when cancelled
+        """
+        result = []
+
+        for cache in sorted(self._caches.values(), key=lambda c: c.name):
+            # a newer search is waiting
+            if generation != self._generation: return None
+
+            positions = cache.get_candidates(
+                term,
+                contiguous=max_distance == 0
+            )
+
+            for position in positions:
+                entry = cache.entries[position]
+                kind, raw, text = entry
+                match = fuzzy.match(
+                    term,
+                    text,
+                    max_distance,
+                    cache.folded[position]
+                )
+                if not match: continue
+
+                # texts can turn out to be links
+                analysis = cache.get_analysis(position)
+                if kinds and analysis.kind not in kinds: continue
+
+                result.append(
+                    (match.score, cache.name, position, entry, match, analysis)
+                )
+
+        result.sort(key=lambda r: (r[0], r[1], r[2]))
+        return result[:limit]
+
+    def _on_done(self, generation, future):
+        self._n_running -= 1
+        if self._n_running == 0: self.emit('running', running=False)
+        if generation != self._generation: return GLib.SOURCE_REMOVE
+
+        try:
+            results = future.result()
+        except Exception as e:
+            logging.error('Histories search failed: %s', e)
+            return GLib.SOURCE_REMOVE
+
+        if results is None: return GLib.SOURCE_REMOVE
+
+        display_budget = get_display_budget()
+        items = []
+
+        for result in results:
+            score, name, position, (kind, raw, text), match, analysis = result
+            item = HistoryItem.new_from_data(
+                position,
+                raw,
+                kind,
+                text,
+                analysis
+            )
+            item.history_name = name
+            item.markup = match.get_highlighted(
+                escape_func=GLib.markup_escape_text,
+                highlight_template=HistoryItem.FILTER_HIGHLIGHT_TPL,
+                max_trailing_chars=display_budget
+            )
+            item.sort_score = score
+            items.append(item)
+
+        self.emit('results', items=items)
+        return GLib.SOURCE_REMOVE
+
+    def preload(self):
+        """ reads and indexes the histories on the worker thread """
+        self._submit(self._load, self._get_names())
+
+    def search(self, term, kinds=None):
+        """
+        Searches all histories but the active one, "results" is
+        emitted with the HistoryItems when done. Without a term
+        all entries of the kinds are found.
+        """
+        self._generation += 1
+        if not term and not kinds: return
+
+        generation = self._generation
+
+        # the stamps are checked on every search, unchanged
+        # histories are kept as they are
+        self.preload()
+        future = self._submit(
+            self._search,
+            generation,
+            term,
+            list(kinds or []),
+            common.SNAPSHOT.fuzzy_search_max_distance,
+            common.SNAPSHOT.max_filter_results
+        )
+        future.add_done_callback(
+            lambda f: GLib.idle_add(self._on_done, generation, f)
+        )
+
+        self._n_running += 1
+        if self._n_running == 1: self.emit('running', running=True)
+
+    def cancel(self):
+        """ drops the results of the running search """
+        self._generation += 1
+
+    def shutdown(self):
+        self.cancel()
+        if self._executor is None: return
+
+        self._executor.shutdown(wait=True)
+        self._executor = None
@@ -19,20 +19,66 @@ import os
 
 import humanize
 from gi.repository import Gio
+from gi.repository import Gdk
 from gi.repository import GLib
 from gi.repository import GdkPixbuf
 
 from draobpilc import common
 from draobpilc.history_item_kind import HistoryItemKind
-from draobpilc.lib import utils
-from draobpilc.lib import gpaste_client
-from draobpilc.lib.signals import Emitter
+from draobpilc.lib import fuzzy
+from draobpilc.lib import analyzer
+from draobpilc.lib import tracing
+from draobpilc.lib import history_backend
+from draobpilc.lib.signals import SharedEmitter
 from draobpilc.widgets.history_item_view import HistoryItemView
 
+# the narrowest glyph expected in a label, px
+MIN_GLYPH_WIDTH = 4
+DEFAULT_SCREEN_WIDTH = 1920
 
-class HistoryItem(Emitter):
+
+def get_display_budget():
+    """
+    Max number of characters a label can show: the list is at most
+    "width-percents" of the screen wide and "item-max-lines" high
+    """
+    screen = Gdk.Screen.get_default()
+    screen_width = screen.get_width() if screen else DEFAULT_SCREEN_WIDTH
+    row_width = screen_width * common.SNAPSHOT.width_percents / 100
+    chars_per_line = max(1, int(row_width / MIN_GLYPH_WIDTH))
+
+    return chars_per_line * common.SNAPSHOT.item_max_lines
+
+
+class HistoryItem(SharedEmitter):
 
     FILTER_HIGHLIGHT_TPL = '<span bgcolor="yellow" fgcolor="black"><b>%s</b></span>'
+    HISTORY_NAME_TPL = '<span size="small"><i>[%s]</i></span> %s'
+
+    SIGNALS = ('changed',)
+
+    __slots__ = (
+        '_index',
+        '_raw',
+        '_kind',
+        '_text',
+        '_folded',
+        '_folded_offsets',
+        '_markup',
+        '_source_markup',
+        '_sort_score',
+        '_n_lines',
+        '_links',
+        '_content_type',
+        '_thumb_path',
+        '_info_string',
+        '_widget',
+        '_app_info',
+        '_file_info_loaded',
+        '_search_id',
+        '_history_name',
+        '__weakref__'
+    )
 
     def __init__(self, index):
         super().__init__()
@@ -40,19 +86,27 @@ class HistoryItem(Emitter):
         self._index = None
         self._raw = None
         self._kind = None
+        # None while the text is the same as raw
         self._text = None
+        # fuzzy.fold() of the text, None while it's the text itself
+        self._folded = None
+        self._folded_offsets = None
         self._markup = None
         self._source_markup = None
         self._sort_score = None
         self._n_lines = None
-        self._link = None
+        self._links = None
         self._content_type = None
         self._thumb_path = None
         self._info_string = None
         self._widget = None
         self._app_info = None
-
-        self.add_signal('changed')
+        # thumbnail, content type and app are looked up on first use,
+        # usually when the row is shown
+        self._file_info_loaded = False
+        self._search_id = None
+        # None for items of the active history
+        self._history_name = None
 
         if index >= 0: self.load_data(index)
 
@@ -60,53 +114,71 @@ class HistoryItem(Emitter):
         text = 'Data not loaded'
 
         try:
-            text = ' '.join(self.text.split())
-        except AttributeError:
+            text = analyzer.get_display_prefix(self.text, 30)
+        except TypeError:
             pass
-        else:
-            text = text.strip()[:30]
 
         return '<HistoryItem: index=%i, "%s">' % (self.index, text)
 
+    @tracing.traced(category='model')
     def load_data(self, index):
         emit_signal = False
         if self.index: emit_signal = True
 
+        backend = history_backend.get_default()
         self.index = index
-        self._raw = gpaste_client.get_raw_element(self.index)
-        self._kind = gpaste_client.get_element_kind(self.index)
-
-        if (self.kind == HistoryItemKind.TEXT and
-            utils.is_url(self.raw)
-        ):
-            self._kind = HistoryItemKind.LINK
+        self._set_data(
+            backend.get_raw_element(index),
+            backend.get_element_kind(index),
+            backend.get_element(index)
+        )
+        if emit_signal: self.emit('changed')
 
-        self._n_lines = len(self.raw.split('\n'))
-        self._links = self._get_links()
-        self._thumb_path = self._get_thumb_path()
-        self._app_info = self._get_app_info()
-        self._info_string = self._get_info()
+    def _set_data(self, raw, kind, text, analysis=None):
+        if analysis is None: analysis = analyzer.analyze(kind, raw)
 
-        if not self._widget: self._widget = HistoryItemView(self)
+        self._raw = raw
+        self._kind = analysis.kind
+        self._n_lines = analysis.n_lines
+        self._links = analysis.links
+        self._content_type = None
+        self._thumb_path = None
+        self._app_info = None
+        self._file_info_loaded = False
+        self._info_string = None
 
-        self.text = gpaste_client.get_element(self.index)
-        if emit_signal: self.emit('changed')
+        self.text = text
 
     def _get_display_text(self, text, escape=True):
-        text = ' '.join(text.split())
-        text = text.strip()
-        if escape: text = GLib.markup_escape_text(text)
+        if escape:
+            # only the part that fits into the label, however big the text
+            text = analyzer.get_display_prefix(text, get_display_budget())
+            text = GLib.markup_escape_text(text)
+        else:
+            text = ' '.join(text.split())
 
         if self.kind == HistoryItemKind.FILE:
             text = text.replace('[Files]', '', 1)
         if self.kind == HistoryItemKind.IMAGE:
             text = text.replace('[Image]', '', 1)
 
-        if common.SETTINGS[common.SHOW_INDEXES]:
+        if common.SNAPSHOT.show_indexes:
             text = '<b>%i</b>. %s' % (self.index, text)
 
+        if self._history_name is not None:
+            text = HistoryItem.HISTORY_NAME_TPL % (
+                GLib.markup_escape_text(self._history_name),
+                text
+            )
+
         return text
 
+    def _update_label(self):
+        # the widget is created on demand, it will pick up the label then
+        if not self._widget: return
+        self._widget.set_label(self.markup or self.display_text)
+
+    @tracing.traced(category='thumbnail')
     def _get_thumb_path(self):
         result = None
         if (
@@ -169,16 +241,6 @@ class HistoryItem(Emitter):
 
         return app_info
 
-    def _get_links(self):
-        result = []
-        links = utils.extract_urls(self.raw)
-
-        if links:
-            result = links
-        
-        result = links
-        return result
-
     def _get_info(self):
         result = ''
 
@@ -210,28 +272,17 @@ class HistoryItem(Emitter):
 
     @classmethod
     def new_from_raw(cls, raw_content, kind=HistoryItemKind.TEXT):
-        item = cls(-1)
-        item._index = -1
-        item._raw = raw_content
-        item._kind = kind
-
-        if (item.kind == HistoryItemKind.TEXT and
-            utils.is_url(item.raw)
-        ):
-            item._kind = HistoryItemKind.LINK
-
-        item._n_lines = len(item.raw.split('\n'))
-        item._links = item._get_links()
-        item._thumb_path = item._get_thumb_path()
-        item._app_info = item._get_app_info()
-        item._info_string = item._get_info()
-
-        if not item._widget: item._widget = HistoryItemView(item)
-
-        if item.kind == HistoryItemKind.FILE: text = '[Files] ' + raw_content
+        if kind == HistoryItemKind.FILE: text = '[Files] ' + raw_content
         else: text = raw_content
 
-        item.text = text
+        return cls.new_from_data(-1, raw_content, kind, text)
+
+    @classmethod
+    def new_from_data(cls, index, raw, kind, text, analysis=None):
+        """ for data that was already fetched from the backend """
+        item = cls(-1)
+        item._index = index
+        item._set_data(raw, kind, text, analysis)
         return item
 
     @property
@@ -261,14 +312,25 @@ class HistoryItem(Emitter):
 
     @property
     def text(self):
+        if self._text is None: return self._raw
         return self._text
 
     @text.setter
     def text(self, value):
-        self._text = value
+        if value == self._raw: self._text = None
+        else: self._text = value
+
+        folded, self._folded_offsets = fuzzy.fold(value)
+        if folded == value: self._folded = None
+        else: self._folded = folded
 
-        if not self.markup:
-            self.widget.set_label(self.display_text)
+        if not self.markup: self._update_label()
+
+    @property
+    def folded_text(self):
+        """ fuzzy.fold() of the text, for fuzzy.match() """
+        if self._folded is None: return self.text, self._folded_offsets
+        return self._folded, self._folded_offsets
 
     @property
     def markup(self):
@@ -279,18 +341,22 @@ class HistoryItem(Emitter):
         if not value:
             self._markup = None
             self._source_markup = None
-            self.widget.set_label(self.display_text)
         else:
             self._source_markup = value
             self._markup = self._get_display_text(value, False)
-            self.widget.set_label(self.markup)
+
+        self._update_label()
 
     @property
     def display_text(self):
-        return self._get_display_text(self._text)
+        return self._get_display_text(self.text)
 
     @property
     def widget(self):
+        if not self._widget:
+            self._widget = HistoryItemView(self)
+            self._widget.set_label(self.markup or self.display_text)
+
         return self._widget
 
     @property
@@ -301,8 +367,33 @@ class HistoryItem(Emitter):
     def sort_score(self, value):
         self._sort_score = value
     
+    @property
+    def search_id(self):
+        return self._search_id
+
+    @search_id.setter
+    def search_id(self, value):
+        self._search_id = value
+
+    @property
+    def history_name(self):
+        return self._history_name
+
+    @history_name.setter
+    def history_name(self, value):
+        self._history_name = value
+        if not self.markup: self._update_label()
+
+    def _load_file_info(self):
+        if self._file_info_loaded: return
+
+        self._file_info_loaded = True
+        self._thumb_path = self._get_thumb_path()
+        self._app_info = self._get_app_info()
+
     @property
     def thumb_path(self):
+        self._load_file_info()
         return self._thumb_path
     
     @property
@@ -315,13 +406,16 @@ class HistoryItem(Emitter):
 
     @property
     def info_string(self):
+        if self._info_string is None: self._info_string = self._get_info()
         return self._info_string
     
     @property
     def content_type(self):
+        self._load_file_info()
         return self._content_type
 
     @property
     def app_info(self):
+        self._load_file_info()
         return self._app_info
     
\ No newline at end of file
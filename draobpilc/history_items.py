@@ -15,13 +15,108 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import os
+import time
+import heapq
+import logging
+import collections
+
 from gi.repository import GLib
 
 from draobpilc import common
 from draobpilc.lib import fuzzy
-from draobpilc.lib import gpaste_client
+from draobpilc.lib import tracing
+from draobpilc.lib import analyzer
+from draobpilc.lib import trigram_index
+from draobpilc.lib import regex_worker
+from draobpilc.lib import sharded_search
+from draobpilc.lib import history_backend
+from draobpilc.lib.history_backend import Action, Target
 from draobpilc.lib.signals import Emitter
-from draobpilc.history_item import HistoryItem
+from draobpilc.history_item import HistoryItem, get_display_budget
+
+# new texts are indexed for search in idle slices that long
+INDEX_SLICE_MS = 10
+# texts are shipped to each search worker in idle slices that big
+SHARD_FLUSH_TEXTS = 1000
+# results of that many recent queries are kept while the history
+# doesn't change, as long as they have that many matches in total
+QUERY_CACHE_SIZE = 32
+QUERY_CACHE_MAX_MATCHES = 200000
+# how often streamed regex matches are picked up
+REGEX_POLL_MS = 30
+# a regex query's time is counted once the worker has it, starting
+# or restarting the worker and sending it the texts may take that long
+REGEX_START_TIMEOUT_MS = 5000
+# a thaw waiting for updates gives up on them after that long
+THAW_TIMEOUT_MS = 1000
+# item sets of that many inactive histories are kept for switching back
+HISTORY_CACHE_SIZE = 3
+
+
+class RegexSearchState():
+    RUNNING = 'running'
+    DONE = 'done'
+    # the worker ran out of time, the results are partial
+    TIMED_OUT = 'timed-out'
+    ERROR = 'error'
+    CANCELLED = 'cancelled'
+
+
+def merge_updates(updates):
+    """
+    Collapses a burst of (action, target, position) Update signals.
+    Returns (reset, positional): reset is Action.REPLACE when the
+    whole history has to be reloaded, Action.REMOVE when it was
+    emptied or None, positional is a list of (action, position)
+    to apply in order on top of it.
+    """
+    reset = None
+    positional = []
+
+    for action, target, position in updates:
+        if action not in (Action.REPLACE, Action.REMOVE): continue
+
+        if target == Target.ALL:
+            reset = action
+            positional = []
+        elif target != Target.POSITION:
+            continue
+        elif reset == Action.REPLACE:
+            # the reload picks the final state anyway
+            continue
+        elif reset == Action.REMOVE:
+            reset = Action.REPLACE
+        else:
+            positional.append((action, position))
+
+    return reset, positional
+
+
+def _find_by_index(items, index):
+    """ bisect_left() for a list of items sorted by index """
+    low, high = 0, len(items)
+
+    while low < high:
+        middle = (low + high) // 2
+        if items[middle].index < index: low = middle + 1
+        else: high = middle
+
+    return low
+
+
+def _insert_by_index(items, item):
+    items.insert(_find_by_index(items, item.index), item)
+
+
+def _remove_by_index(items, item):
+    position = _find_by_index(items, item.index)
+
+    for position in range(position, len(items)):
+        if items[position] is item:
+            del items[position]
+            return
+        if items[position].index != item.index: break
 
 
 class HistoryItems(Emitter):
@@ -31,20 +126,70 @@ class HistoryItems(Emitter):
 
         self._items = []
         self._filter_result = []
+        # item -> fuzzy.Result, highlighted once it's visible
+        self._filter_matches = {}
         self._filter_mode = False
+        # bumped on every change of items, texts or positions
+        self._generation = 0
+        # (term, kinds, settings, generation) -> [(item, match)] ranked
+        self._query_cache = collections.OrderedDict()
+        self._n_cached_matches = 0
+        # read-only snapshot of "items", built on first read after a change
+        self._view = None
         self._raw_history = []
+        self._search_index = trigram_index.TrigramIndex.load(
+            common.SEARCH_INDEX_PATH
+        )
+        # search index document id -> items with that text
+        self._search_docs = {}
+        # kind -> items of that kind sorted by index,
+        # for flag-restricted searches
+        self._kind_items = {}
+        self._index_id = 0
+        # worker processes searching big histories, see _check_sharding()
+        self._sharded_search = None
+        self._sharded_search_failed = False
+        # process running /pattern/ searches, started on the first one
+        self._regex_worker = None
+        self._regex_kinds = None
+        self._regex_deadline = 0
+        self._regex_poll_id = 0
+        # history name -> (items, size, hash of the raw history),
+        # the least recently used first
+        self._history_cache = collections.OrderedDict()
+        # the items belong to another history until the next reload
+        self._switched = False
+        self._pending_updates = []
+        self._flush_id = 0
+        self._hidden = False
+        self._frozen = False
+        # queued updates a waiting thaw needs, see freeze()
+        self._thaw_updates = 0
+        self._thaw_id = 0
 
         self.add_signal('removed')
         self.add_signal('changed')
-
-        self._signal_match = gpaste_client.connect('Update', self._on_update)
+        self.add_signal('regex-state')
+        self.add_signal('thawed')
+
+        self._backend = history_backend.get_default()
+        self._history_name = self._backend.get_history_name()
+        self._backend.connect('Update', self._on_update)
+        self._backend.connect('SwitchHistory', self._on_switch_history)
+        self._backend.connect('DeleteHistory', self._on_delete_history)
+        common.SETTINGS.connect(
+            'changed::' + common.MAX_FILTER_RESULTS,
+            lambda s, k: self._invalidate()
+        )
         self.reload_history()
+        # forget the saved documents that aren't in the history anymore
+        self._search_index.prune()
 
     def __len__(self):
         if self._filter_mode:
             result = min(
                 len(self._filter_result),
-                common.SETTINGS[common.MAX_FILTER_RESULTS]
+                common.SNAPSHOT.max_filter_results
             )
         else:
             result = len(self._items)
@@ -58,150 +203,741 @@ class HistoryItems(Emitter):
         return self.items[key]
 
     def _on_update(self, action, target, position):
-        self._raw_history = gpaste_client.get_raw_history()
-
-        if action == gpaste_client.Action.REPLACE:
-            if target == gpaste_client.Target.ALL:
-                self.reload_history()
-            elif target == gpaste_client.Target.POSITION:
-                self.reload_item(position)
-            else:
-                pass
-        elif action == gpaste_client.Action.REMOVE:
-            if target == gpaste_client.Target.ALL:
-                self.clear()
-            elif target == gpaste_client.Target.POSITION:
-                self.remove(position)
+        self._pending_updates.append(
+            (str(action), str(target), int(position))
+        )
+
+        if self._thaw_id and len(self._pending_updates) >= self._thaw_updates:
+            self._thaw()
+            return
+
+        if self._flush_id or self._frozen: return
+
+        if self._hidden:
+            # nobody looks at the list: the recorded delta is applied
+            # as one change when nothing else is waiting
+            self._flush_id = GLib.idle_add(
+                self._on_flush,
+                priority=GLib.PRIORITY_LOW
+            )
+            return
+
+        timeout = common.SNAPSHOT.update_timeout_ms
+
+        if timeout > 0:
+            self._flush_id = GLib.timeout_add(timeout, self._on_flush)
         else:
-            pass
+            self._flush_id = GLib.idle_add(self._on_flush)
+
+    def _on_switch_history(self, name):
+        name = str(name)
+        if name == self._history_name: return
+
+        # the items were stashed by a switch that wasn't reloaded yet
+        if not self._switched:
+            self._history_cache[self._history_name] = (
+                list(self._items),
+                len(self._raw_history),
+                hash(tuple(self._raw_history))
+            )
+            self._history_cache.move_to_end(self._history_name)
 
-    def _get_by_raw(self, raw):
-        result = None
+        while len(self._history_cache) > HISTORY_CACHE_SIZE:
+            evicted_name, evicted = self._history_cache.popitem(last=False)
+            self._release_items(evicted[0])
 
-        for item in self._items:
-            if item.raw != raw: continue
-            result = item
-            break
+        self._history_name = name
+        self._switched = True
 
-        return result
+    def _on_delete_history(self, name):
+        cached = self._history_cache.pop(str(name), None)
+        if cached: self._release_items(cached[0])
+
+    def _index_item(self, item):
+        if item.search_id is None:
+            item.search_id = self._search_index.add(item.text)
+
+        items = self._search_docs.setdefault(item.search_id, [])
+        if not items:
+            if self._sharded_search:
+                self._sharded_search.add(item.search_id, item.text)
+            if self._regex_worker:
+                self._regex_worker.add(item.search_id, item.text)
+
+        items.append(item)
+        _insert_by_index(self._kind_items.setdefault(item.kind, []), item)
+
+        if self._search_index.has_pending and not self._index_id:
+            self._index_id = GLib.idle_add(
+                self._on_index_pending,
+                priority=GLib.PRIORITY_LOW
+            )
+
+    def _on_index_pending(self):
+        more = self._search_index.index_pending(INDEX_SLICE_MS / 1000)
+        if more: return GLib.SOURCE_CONTINUE
+
+        self._index_id = 0
+        return GLib.SOURCE_REMOVE
+
+    def _unindex_item(self, item, keep_ref=False):
+        """
+        With keep_ref the item's text stays in the search index,
+        for items kept in the history cache
+        """
+        doc_id = item.search_id
+        if doc_id is None: return
+
+        kind_items = self._kind_items.get(item.kind, None)
+        if kind_items: _remove_by_index(kind_items, item)
+
+        items = self._search_docs.get(doc_id, [])
+        if item in items: items.remove(item)
+
+        if not items and self._search_docs.pop(doc_id, None) is not None:
+            if self._sharded_search: self._sharded_search.remove(doc_id)
+            if self._regex_worker: self._regex_worker.remove(doc_id)
+
+        if keep_ref: return
+
+        self._search_index.remove(doc_id)
+        item.search_id = None
+
+    def _release_items(self, items):
+        """ for items dropped from the history cache """
+        for item in items: self._unindex_item(item)
+
+    def _check_sharding(self):
+        """
+        Starts the search workers once the history is big enough and
+        there is more than one core for them, they run until shutdown
+        """
+        if self._sharded_search or self._sharded_search_failed: return
+        if len(self._items) < common.SNAPSHOT.sharded_search_min_items: return
+
+        n_workers = common.SNAPSHOT.search_workers
+        if n_workers <= 0: n_workers = os.cpu_count() or 1
+        if n_workers < 2: return
+
+        self._sharded_search = sharded_search.ShardedSearch(n_workers)
+        for doc_id, items in self._search_docs.items():
+            self._sharded_search.add(doc_id, items[0].text)
+
+        # ship the texts before the first query needs them
+        GLib.idle_add(self._on_flush_shards, priority=GLib.PRIORITY_LOW)
+
+    def _on_flush_shards(self):
+        if not self._sharded_search: return GLib.SOURCE_REMOVE
+
+        if self._sharded_search.flush(SHARD_FLUSH_TEXTS):
+            return GLib.SOURCE_CONTINUE
+        if not self._sharded_search.running:
+            self._stop_sharding()
+
+        return GLib.SOURCE_REMOVE
+
+    def _stop_sharding(self):
+        """ searches are done here after the workers failed """
+        self._sharded_search.shutdown()
+        self._sharded_search = None
+        self._sharded_search_failed = True
+
+    def _invalidate(self):
+        self._view = None
+
+    def _bump_generation(self):
+        self._generation += 1
+        self._query_cache.clear()
+        self._n_cached_matches = 0
+
+    def _cache_query(self, key, matches):
+        replaced = self._query_cache.pop(key, None)
+        if replaced is not None: self._n_cached_matches -= len(replaced)
+
+        self._query_cache[key] = matches
+        self._n_cached_matches += len(matches)
+
+        while (
+            len(self._query_cache) > QUERY_CACHE_SIZE or
+            self._n_cached_matches > QUERY_CACHE_MAX_MATCHES
+        ):
+            evicted_key, evicted = self._query_cache.popitem(last=False)
+            self._n_cached_matches -= len(evicted)
+
+    def _on_flush(self):
+        self._flush_id = 0
+        self.flush_updates()
+        return GLib.SOURCE_REMOVE
+
+    def _apply_positional(self, updates):
+        removed = []
+        replaced = set()
+
+        for action, position in updates:
+            list_position = self._get_position(position)
+            item = self.get(position)
+
+            if action == Action.REMOVE:
+                if item:
+                    del self._items[list_position]
+                    self._unindex_item(item)
+                    if item in self._filter_result:
+                        self._filter_result.remove(item)
+
+                    replaced.discard(item)
+                    removed.append(item)
+
+                # the items from there on are the ones after position
+                for other in self._items[list_position:]: other.index -= 1
+            elif item:
+                replaced.add(item)
+
+        for item in replaced:
+            self._unindex_item(item)
+            item.load_data(item.index)
+            self._index_item(item)
+
+        self._raw_history = self._backend.get_raw_history()
+        self._sync_index()
+        self._items.sort(key=lambda e: e.index)
+        self._invalidate()
+        self._bump_generation()
+
+        for item in removed: self.emit('removed', item=item)
+        return len(self._items) == len(self._raw_history)
 
     def _sync_index(self):
+        positions = {}
+        for index, raw in enumerate(self._raw_history):
+            positions.setdefault(raw, index)
+
+        moved = []
+
         for item in self._items:
-            try:
-                gpaste_index = self._raw_history.index(item.raw)
-            except ValueError:
-                pass
-            else:
-                if gpaste_index != item.index:
-                    item.index = gpaste_index
+            gpaste_index = positions.get(item.raw, None)
+
+            if gpaste_index is not None and gpaste_index != item.index:
+                moved.append((item, gpaste_index))
+
+        # all of them first, the kind lists are sorted by the old indexes
+        for item, gpaste_index in moved:
+            _remove_by_index(self._kind_items.get(item.kind, []), item)
+
+        for item, gpaste_index in moved:
+            item.index = gpaste_index
+            if item.search_id is not None:
+                _insert_by_index(self._kind_items[item.kind], item)
+
+    def _load_items(self, entries):
+        """ entries is a list of (index, raw) of items to create """
+        if not entries: return []
+
+        # one call for all texts instead of one per item
+        texts = None
+        if len(entries) > 1:
+            texts = self._backend.get_history()
+            if len(texts) != len(self._raw_history): texts = None
+
+        kinds = [self._backend.get_element_kind(index) for index, raw in entries]
+        analyses = analyzer.analyze_many([
+            (kind, raw) for (index, raw), kind in zip(entries, kinds)
+        ])
+        result = []
+
+        for (index, raw), kind, analysis in zip(entries, kinds, analyses):
+            if texts is None: text = self._backend.get_element(index)
+            else: text = texts[index]
+
+            result.append(
+                HistoryItem.new_from_data(index, raw, kind, text, analysis)
+            )
+
+        return result
+
+    @tracing.traced(category='model')
+    def flush_updates(self):
+        """ applies the queued Update signals as one change """
+        if self._flush_id:
+            GLib.source_remove(self._flush_id)
+            self._flush_id = 0
+
+        if self._frozen or not self._pending_updates: return False
+
+        updates = self._pending_updates
+        self._pending_updates = []
+        reset, positional = merge_updates(updates)
+
+        if reset == Action.REPLACE:
+            self.reload_history()
+        elif reset == Action.REMOVE:
+            self.clear()
+        elif positional:
+            if self._apply_positional(positional): self.emit('changed')
+            else: self.reload_history()
+
+        return True
+
+    def set_hidden(self, hidden):
+        """ pending updates are applied right away when shown """
+        self._hidden = hidden
+        if not hidden: self.flush_updates()
+
+    def _get_position(self, index):
+        """
+        Position in _items of the first item with at least that index.
+        Items are sorted by index and between updates their indexes
+        are their positions, so it's usually the index itself.
+        """
+        items = self._items
+        if 0 <= index < len(items) and items[index].index == index:
+            return index
+
+        low = 0
+        high = len(items)
+
+        while low < high:
+            middle = (low + high) // 2
+            if items[middle].index < index: low = middle + 1
+            else: high = middle
+
+        return low
 
     def get(self, index):
-        result = None
+        position = self._get_position(index)
 
-        for item in self.items:
-            if item.index != index: continue
+        if position < len(self._items):
+            item = self._items[position]
+            if item.index == index: return item
 
-            result = item
-            break
+        return None
 
-        return result
+    def get_range(self, indexes):
+        """ items with indexes in the range, in order """
+        if not indexes: return []
+
+        return self._items[
+            self._get_position(indexes[0]):
+            self._get_position(indexes[-1] + 1)
+        ]
 
     def reload_item(self, index):
         item = self.get(index)
         if not item: return False
 
+        # the text and kind can change
+        self._unindex_item(item)
         item.load_data(index)
+        self._index_item(item)
+        self._bump_generation()
         return True
 
     def remove(self, index):
-        item = self.get(index)
-        if not item: return False
+        if not self.get(index): return False
 
-        self.items.remove(item)
-        self._sync_index()
-        self.emit('removed', item=item)
+        self._apply_positional([(Action.REMOVE, index)])
         self.emit('changed')
+        return True
 
+    @tracing.traced(category='model')
     def reload_history(self, emit_signal=True):
         self.reset_filter(emit_signal=False)
-        self._raw_history = gpaste_client.get_raw_history()
+        self._raw_history = self._backend.get_raw_history()
 
         if len(self._raw_history) == 0:
             self.clear()
             return None
 
-        new_list = []
-        new_items = []
+        switched = self._switched
+        self._switched = False
+        cached = self._history_cache.pop(self._history_name, None)
+
+        if cached and cached[1:] == (
+            len(self._raw_history),
+            hash(tuple(self._raw_history))
+        ):
+            # switched back to a history that didn't change
+            new_list = cached[0]
+            to_index = new_list
+        else:
+            # items are never shared between histories
+            if cached: reused = cached[0]
+            elif switched: reused = []
+            else: reused = self._items
 
-        for index, raw in enumerate(self._raw_history):
-            old_item = self._get_by_raw(raw)
+            old_items = {}
+            for item in reused: old_items.setdefault(item.raw, item)
+
+            new_list = []
+            new_entries = []
 
-            if old_item:
-                new_list.append(old_item)
-            else: 
-                new_item = HistoryItem(index)
-                new_items.append(new_item)
+            for index, raw in enumerate(self._raw_history):
+                old_item = old_items.get(raw, None)
 
-        new_list.extend(new_items)
+                if old_item:
+                    new_list.append(old_item)
+                else:
+                    new_entries.append((index, raw))
+
+            new_items = self._load_items(new_entries)
+            new_list.extend(new_items)
+
+            if reused is self._items: to_index = new_items
+            else: to_index = new_list
+
+            if cached:
+                kept = set(new_list)
+                self._release_items(
+                    [item for item in cached[0] if item not in kept]
+                )
+
+        # they are all unindexed below
+        if switched: self._kind_items = {}
+
+        kept = set(new_list)
+        for item in self._items:
+            # items of the previous history stay indexed in the cache
+            if switched: self._unindex_item(item, keep_ref=True)
+            elif item not in kept: self._unindex_item(item)
+
+        for item in to_index: self._index_item(item)
+
+        self._items = new_list
         self._sync_index()
-        self._items = sorted(new_list, key=lambda e: e.index)
+        self._items.sort(key=lambda e: e.index)
+        self._invalidate()
+        self._bump_generation()
+        self._check_sharding()
         if emit_signal: self.emit('changed')
 
     def clear(self):
+        self._kind_items = {}
+
+        for item in self._items:
+            self._unindex_item(item, keep_ref=self._switched)
+
+        self._switched = False
+
         self._raw_history.clear()
         self._items.clear()
+        self._invalidate()
+        self._bump_generation()
         self.reset_filter(emit_signal=False)
         self.emit('changed')
 
-    def freeze(self, freeze):
+    def freeze(self, freeze, expected_updates=0):
+        """
+        While frozen updates are only queued, thawing replays them as
+        one merged change and emits "thawed". Updates of changes made
+        while frozen come later from the main loop: with
+        expected_updates the thaw waits for that many of them, or
+        THAW_TIMEOUT_MS.
+        """
         if freeze:
-            if not self._signal_match: return
-
-            gpaste_client.disconnect(self._signal_match)
-            self._signal_match = None
+            # a thaw still waiting keeps counting
+            if not self._frozen:
+                self._thaw_updates = len(self._pending_updates)
+            self._frozen = True
+
+            if self._flush_id:
+                GLib.source_remove(self._flush_id)
+                self._flush_id = 0
+            if self._thaw_id:
+                GLib.source_remove(self._thaw_id)
+                self._thaw_id = 0
         else:
-            self._signal_match = gpaste_client.connect(
-                'Update',
-                self._on_update
-            )
+            self._thaw_updates += expected_updates
+
+            if len(self._pending_updates) >= self._thaw_updates:
+                self._thaw()
+            elif not self._thaw_id:
+                self._thaw_id = GLib.timeout_add(
+                    THAW_TIMEOUT_MS,
+                    self._on_thaw_timeout
+                )
 
+    def _on_thaw_timeout(self):
+        logging.warning(
+            'Thawed with %i of %i updates',
+            len(self._pending_updates),
+            self._thaw_updates
+        )
+        self._thaw_id = 0
+        self._thaw()
+        return False
+
+    def _thaw(self):
+        if self._thaw_id:
+            GLib.source_remove(self._thaw_id)
+            self._thaw_id = 0
+
+        self._frozen = False
+        self._thaw_updates = 0
+        self.flush_updates()
+        self.emit('thawed')
+
+    @tracing.traced(category='model')
     def filter(self, term='', kinds=None, index=None):
-        if not any([term, kinds, index]):
+        """ index is an index or a range of them, the term is ignored then """
+        if not any([term, kinds, index is not None]):
             self.reset_filter(emit_signal=True)
             return
         else:
             self.reset_filter(emit_signal=False)
 
         self._filter_mode = True
+        max_distance = common.SNAPSHOT.fuzzy_search_max_distance
+        key = None
+        matches = None
 
-        for item in self._items:
-            if index and item.index == index:
-                self._filter_result.append(item)
-                break
+        if index is None:
+            key = (
+                term,
+                frozenset(kinds or ()),
+                max_distance,
+                common.SNAPSHOT.max_filter_results,
+                self._generation
+            )
+            matches = self._query_cache.get(key, None)
+            if matches is not None: self._query_cache.move_to_end(key)
 
+        if matches is None:
+            matches = self._search(term, kinds, index, max_distance)
+            if key is not None: self._cache_query(key, matches)
+
+        for item, match in matches:
+            # index results keep their order
+            item.sort_score = match.score if match else 0
+            self._filter_matches[item] = match
+            self._filter_result.append(item)
+
+        self._highlight_visible()
+        self._invalidate()
+        self.emit('changed')
+
+    def _get_kind_items(self, kinds):
+        """ items of the kinds, sorted by index, not to be changed """
+        lists = [
+            self._kind_items[kind] for kind in set(kinds)
+            if self._kind_items.get(kind, None)
+        ]
+        if not lists: return []
+        if len(lists) == 1: return lists[0]
+
+        merged = heapq.merge(*[
+            [(item.index, id(item), item) for item in items]
+            for items in lists
+        ])
+        return [item for index, item_id, item in merged]
+
+    def _search(self, term, kinds, index, max_distance):
+        """ returns [(item, match)] sorted by score """
+        if index is not None:
+            if isinstance(index, int): index = range(index, index + 1)
+
+            return [
+                (item, None) for item in self.get_range(index)
+                if not kinds or item.kind in kinds
+            ]
+
+        items = self._items
+        if kinds: items = self._get_kind_items(kinds)
+
+        if term and not kinds and self._sharded_search:
+            matches = self._search_sharded(term, max_distance)
+            if matches is not None: return matches
+
+            self._stop_sharding()
+
+        if term:
+            doc_ids = self._search_index.get_candidates(
+                term,
+                contiguous=max_distance == 0
+            )
+
+            # whichever is smaller, the kinds are checked anyway
+            if doc_ids is not None and len(doc_ids) < len(items):
+                items = [
+                    item
+                    for doc_id in doc_ids
+                    for item in self._search_docs.get(doc_id, ())
+                ]
+                items.sort(key=lambda e: e.index)
+
+        matches = []
+
+        for item in items:
             if kinds and item.kind not in kinds: continue
 
             match = fuzzy.match(
                 term,
                 item.text,
-                common.SETTINGS[common.FUZZY_SEARCH_MAX_DISTANCE]
+                max_distance,
+                item.folded_text
+            )
+            if match: matches.append((item, match))
+
+        matches.sort(key=lambda m: m[1].score)
+        return matches
+
+    def _search_sharded(self, term, max_distance):
+        """
+        Only the best results come back from the workers, enough to
+        fill the list. Returns None if the workers are gone.
+        """
+        results = self._sharded_search.search(
+            term,
+            max_distance,
+            common.SNAPSHOT.max_filter_results
+        )
+        if results is None: return None
+
+        matches = []
+
+        for score, doc_id, start, end in results:
+            for item in self._search_docs.get(doc_id, ()):
+                match = fuzzy.Result(term, item.text, score, start, end)
+                matches.append((item, match))
+
+        # the same order as a scan of the items sorted by index
+        matches.sort(key=lambda m: (m[1].score, m[0].index))
+        return matches
+
+    def _highlight_visible(self):
+        """ only the results that fit into the list get markup """
+        display_budget = get_display_budget()
+        visible = self._filter_result[:common.SNAPSHOT.max_filter_results]
+
+        for item in visible:
+            match = self._filter_matches.get(item, None)
+            if match is None or item.markup: continue
+
+            item.markup = match.get_highlighted(
+                escape_func=GLib.markup_escape_text,
+                highlight_template=HistoryItem.FILTER_HIGHLIGHT_TPL,
+                max_trailing_chars=display_budget
+            )
+
+    def filter_regex(self, pattern, kinds=None):
+        """
+        Filters by a regular expression in a worker process. Matches
+        are added as they come, "regex-state" is emitted with the
+        RegexSearchState and a message when it changes.
+        """
+        self.reset_filter(emit_signal=False)
+        self._filter_mode = True
+        self._invalidate()
+
+        if not self._regex_worker:
+            self._regex_worker = regex_worker.RegexWorker()
+            for doc_id, items in self._search_docs.items():
+                self._regex_worker.add(doc_id, items[0].text)
+
+        if not self._regex_worker.search(pattern):
+            self.emit('changed')
+            self.emit(
+                'regex-state',
+                state=RegexSearchState.ERROR,
+                message=_('The search process failed')
             )
+            return
 
-            if match:
-                item.markup = match.get_highlighted(
-                    escape_func=GLib.markup_escape_text,
-                    highlight_template=HistoryItem.FILTER_HIGHLIGHT_TPL
+        timeout = (
+            common.SNAPSHOT.regex_search_timeout_ms +
+            REGEX_START_TIMEOUT_MS
+        ) / 1000
+        self._regex_kinds = kinds
+        # replaced once the worker acknowledges the query
+        self._regex_deadline = time.monotonic() + timeout
+        self._regex_poll_id = GLib.timeout_add(
+            REGEX_POLL_MS,
+            self._on_regex_poll
+        )
+
+        self.emit('changed')
+        self.emit('regex-state', state=RegexSearchState.RUNNING, message=None)
+
+    def _on_regex_poll(self):
+        state = None
+        message = None
+        n_results = len(self._filter_result)
+
+        for reply in self._regex_worker.receive():
+            if reply[0] == 'started':
+                timeout = common.SNAPSHOT.regex_search_timeout_ms / 1000
+                self._regex_deadline = time.monotonic() + timeout
+            elif reply[0] == 'matches':
+                self._add_regex_matches(reply[1])
+            elif reply[0] == 'error':
+                state = RegexSearchState.ERROR
+                message = _('The search failed: %s') % reply[1]
+            elif reply[0] == 'done':
+                state = RegexSearchState.DONE
+
+        if state is None and time.monotonic() > self._regex_deadline:
+            # the next query finds a fresh process with the texts
+            self._regex_worker.restart()
+            state = RegexSearchState.TIMED_OUT
+
+        if len(self._filter_result) != n_results:
+            self._filter_result.sort(key=lambda e: e.sort_score)
+            self._highlight_visible()
+            self._invalidate()
+            self.emit('changed')
+
+        if state is None: return GLib.SOURCE_CONTINUE
+
+        self._regex_poll_id = 0
+        self.emit('regex-state', state=state, message=message)
+        return GLib.SOURCE_REMOVE
+
+    def _add_regex_matches(self, matches):
+        kinds = self._regex_kinds
+
+        for doc_id, start, end in matches:
+            for item in self._search_docs.get(doc_id, ()):
+                if kinds and item.kind not in kinds: continue
+
+                text = item.text
+                # the matched text as the term highlights all of it
+                match = fuzzy.Result(
+                    text[start:end],
+                    text,
+                    item.index,
+                    start,
+                    end
                 )
-                item.sort_score = match.score
+                # in history order
+                item.sort_score = item.index
+                self._filter_matches[item] = match
                 self._filter_result.append(item)
-            else:
-                item.markup = None
-                item.sort_score = None
 
+    def _cancel_regex(self):
+        if not self._regex_poll_id: return
+
+        GLib.source_remove(self._regex_poll_id)
+        self._regex_poll_id = 0
+        self._regex_worker.cancel()
+        self.emit(
+            'regex-state',
+            state=RegexSearchState.CANCELLED,
+            message=None
+        )
+
+    def merge_results(self, items):
+        """
+        Adds scored items found elsewhere, e.g. in other histories,
+        to the current filter result
+        """
+        if not self._filter_mode or not items: return
+
+        self._filter_result.extend(items)
         self._filter_result.sort(key=lambda e: e.sort_score)
+        self._highlight_visible()
+        self._invalidate()
         self.emit('changed')
 
     def reset_filter(self, emit_signal=True):
+        self._cancel_regex()
         if not self._filter_mode: return
 
         for filtered in self._filter_result:
@@ -209,22 +945,45 @@ class HistoryItems(Emitter):
             filtered.sort_score = None
 
         self._filter_result.clear()
+        self._filter_matches.clear()
         self._filter_mode = False
+        self._invalidate()
         if emit_signal: self.emit('changed')
 
+    def shutdown(self):
+        self._cancel_regex()
+        if self._sharded_search: self._sharded_search.shutdown()
+        if self._regex_worker: self._regex_worker.shutdown()
+
+    def save_search_index(self):
+        """ texts that are not indexed yet are left out """
+        try:
+            self._search_index.save(common.SEARCH_INDEX_PATH)
+        except OSError as e:
+            logging.warning('Can\'t save the search index: %s', e)
+
     @property
     def items(self):
+        """ a tuple, the lists are kept sorted on mutation """
+        if self._view is not None: return self._view
+
         if self._filter_mode:
-            self._filter_result.sort(key=lambda e: e.sort_score)
-            return self._filter_result[:common.SETTINGS[common.MAX_FILTER_RESULTS]]
+            self._view = tuple(
+                self._filter_result[:common.SNAPSHOT.max_filter_results]
+            )
         else:
-            self._items.sort(key=lambda e: e.index)
-            return self._items
+            self._view = tuple(self._items)
+
+        return self._view
     
     @property
     def n_total(self):
         return len(self._items)
     
+    @property
+    def hidden(self):
+        return self._hidden
+
     @property
     def filter_mode(self):
         return self._filter_mode
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+# Copyright 2016 Ivan awamper@gmail.com
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# 64-bit masks of the characters a text contains, folded the way the
+# fuzzy matcher compares them. A text can only match a term if its
+# mask has all the bits of the term's mask, so a column of masks
+# rejects most of a history with one vectorized AND when NumPy
+# is installed.
+
+import string
+
+try:
+    import numpy
+except ImportError:
+    NUMPY_INSTALLED = False
+else:
+    NUMPY_INSTALLED = True
+
+from draobpilc.lib import fuzzy
+
+MASK_BITS = 64
+# letters and digits get a bit each, others share the rest
+_OWN_BITS = string.ascii_lowercase + string.digits
+_bits = {char: 1 << bit for bit, char in enumerate(_OWN_BITS)}
+
+
+def _get_bit(char):
+    bit = _bits.get(char, None)
+
+    if bit is None:
+        shared = MASK_BITS - len(_OWN_BITS)
+        bit = 1 << (len(_OWN_BITS) + ord(char) % shared)
+        _bits[char] = bit
+
+    return bit
+
+
+def get_mask(text):
+    mask = 0
+    for char in set(fuzzy.fold(text)[0]): mask |= _get_bit(char)
+    return mask
+
+
+def find(masks, mask):
+    """
+    Positions in masks, an array.array('Q'), of the masks that have
+    all the bits of mask. Zero masks never match a non-zero one.
+    """
+    if not masks: return []
+
+    if NUMPY_INSTALLED:
+        column = numpy.frombuffer(masks, dtype=numpy.uint64)
+        mask = numpy.uint64(mask)
+        return numpy.flatnonzero((column & mask) == mask).tolist()
+
+    return [
+        position
+        for position, text_mask in enumerate(masks)
+        if text_mask & mask == mask
+    ]
@@ -16,10 +16,18 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import re
+import array
+import bisect
+import functools
+import unicodedata
+
+_NON_ASCII_RE = re.compile('[^\x00-\x7f]')
 
 
 class Result():
 
+    __slots__ = ('term', 'original', 'score', 'start', 'end')
+
     def __init__(self, term, original, score, start, end):
         self.term = term
         self.original = original
@@ -31,7 +39,8 @@ class Result():
         self,
         escape_func=None,
         max_precede_chars=30,
-        highlight_template='%s'
+        highlight_template='%s',
+        max_trailing_chars=None
     ):
         matched_string = self.original[self.start : self.end]
         new_string = ''
@@ -44,45 +53,254 @@ class Result():
             new_string += '...'
             new_string += temp_string
 
-        search_term = self.term.lower()
-        next_term_char = None
+        # the term characters from the start, on folded characters
+        folded_term = _fold_term(self.term)
+        term_position = 0
 
         for char in matched_string:
-            if not char.lower() in search_term:
-                if escape_func: char = escape_func(char)
-                new_string += char
-            else:
-                if next_term_char and char != next_term_char:
-                    continue
-
-                try:
-                    index = search_term.index(char.lower())
-                    next_term_char = search_term[index + 1]
-                except (IndexError, ValueError):
-                    next_term_char = None
-
-                search_term = search_term.replace(char, '', 1)
-                if escape_func: char = escape_func(char)
-                new_string += highlight_template % (char)
-
-        other_text = self.original[self.end:]
+            folded_char = _fold_char(char)
+            n_matched = 0
+
+            while (
+                n_matched < len(folded_char) and
+                term_position < len(folded_term) and
+                folded_char[n_matched] == folded_term[term_position]
+            ):
+                n_matched += 1
+                term_position += 1
+
+            if escape_func: char = escape_func(char)
+            if n_matched: new_string += highlight_template % (char)
+            else: new_string += char
+
+        if max_trailing_chars is None:
+            other_text = self.original[self.end:]
+        else:
+            other_text = self.original[
+                self.end : self.end + max_trailing_chars
+            ]
+
         if escape_func: other_text = escape_func(other_text) 
         new_string += other_text
 
         return new_string
     
 
-# based on https://github.com/amjith/fuzzyfinder
-def match(term, text, max_distance=30):
-    result = None
+# characters that don't fold to exactly one, see _fold_char()
+_irregular = set()
+
+
+@functools.lru_cache(maxsize=None)
+def _fold_char(char):
+    """ case folded, without diacritics, can be empty or longer """
+    decomposed = unicodedata.normalize('NFKD', char)
+    stripped = ''.join([
+        part for part in decomposed if not unicodedata.combining(part)
+    ])
+    folded = stripped.casefold().lower()
+    if len(folded) != 1: _irregular.add(char)
+
+    return folded
+
+
+def _fold_match(char_match):
+    return _fold_char(char_match.group())
+
+
+def fold(text):
+    """
+    What the matcher compares: (folded, offsets), text case folded
+    and without diacritics, so "É" and "ß" match "e" and "ss".
+    offsets maps positions in folded back to text, see
+    _get_original(), None when they are the same. Computed once
+    per text by the callers that can keep it.
+    """
+    if not _NON_ASCII_RE.search(text): return text.lower(), None
+
+    # only the other characters go through Python
+    folded = _NON_ASCII_RE.sub(_fold_match, text).lower()
+    if _irregular.isdisjoint(text): return folded, None
+
+    # the folded positions where folded position - text position
+    # changes, then what it becomes there
+    breaks = array.array('i')
+    shifts = array.array('i')
+    shift = 0
+
+    for char_match in _NON_ASCII_RE.finditer(text):
+        length = len(_fold_char(char_match.group()))
+        if length == 1: continue
+
+        folded_position = char_match.start() + shift
+
+        if length == 0:
+            shift -= 1
+            breaks.append(folded_position)
+            shifts.append(shift)
+
+        for i in range(1, length):
+            shift += 1
+            breaks.append(folded_position + i)
+            shifts.append(shift)
+
+    breaks.extend(shifts)
+    return folded, breaks
+
+
+def _get_original(offsets, position):
+    """ the position in the text of position in the folded text """
+    n_breaks = len(offsets) // 2
+    index = bisect.bisect_right(offsets, position, 0, n_breaks)
+    if not index: return position
+
+    return position - offsets[n_breaks + index - 1]
+
+
+@functools.lru_cache(maxsize=256)
+def _fold_term(term):
+    return fold(term)[0]
+
+
+@functools.lru_cache(maxsize=256)
+def _get_term_info(folded_term):
+    """ (regex of the term characters and newlines, char -> indexes) """
+    indexes = {}
+    for index, char in enumerate(folded_term):
+        indexes.setdefault(char, []).append(index)
+
+    chars_re = re.compile(
+        '[%s\\n]' % ''.join(re.escape(char) for char in indexes)
+    )
+
+    return chars_re, indexes
+
+
+def _find_end(term, text, max_distance, chars_re, indexes):
+    """
+    Forward pass: the end of the chain that ends first. For every
+    term prefix only the latest position where a valid chain for it
+    ends is kept, the latest leaves the most room for the next gap.
+    Gaps don't span lines.
+    """
+    last_index = len(term) - 1
+    last = [-1] * len(term)
+    last_newline = -1
+
+    for char_match in chars_re.finditer(text, text.find(term[0])):
+        position = char_match.start()
+        char = char_match.group()
+
+        # from the end, so a position extends a chain only once
+        for index in reversed(indexes.get(char, ())):
+            if index > 0:
+                previous = last[index - 1]
+                if previous < 0 or previous < last_newline: continue
+                if position - previous - 1 > max_distance: continue
+
+            if index == last_index: return position + 1
+            last[index] = position
+
+        if char == '\n': last_newline = position
+
+    return None
+
+
+def _find_start(term, text, end, max_distance, chars_re, indexes):
+    """
+    Backward pass from the last character at end - 1: the latest
+    start of a chain ending there
+    """
+    last_index = len(term) - 1
+    if last_index == 0: return end - 1
+
+    first = [-1] * len(term)
+    first[last_index] = end - 1
+    next_newline = end
+    window_start = max(0, end - 1 - last_index * (max_distance + 1))
+    positions = [
+        char_match.start()
+        for char_match in chars_re.finditer(text, window_start, end - 1)
+    ]
+
+    for position in reversed(positions):
+        char = text[position]
+
+        for index in indexes.get(char, ()):
+            if index == last_index: continue
+
+            following = first[index + 1]
+            if following < 0 or following > next_newline: continue
+            if following - position - 1 > max_distance: continue
+
+            if index == 0: return position
+            first[index] = position
+
+        if char == '\n': next_newline = position
+
+    # unreachable, the forward pass found a chain
+    return window_start
+
+
+def match(term, text, max_distance=30, folded_text=None):
+    """
+    Finds the characters of term in text, in order, case and accent
+    insensitively, with at most max_distance characters between two
+    of them. The chain that ends first wins and the score is its end,
+    lower is better. Two linear passes over the term characters
+    in text instead of a backtracking regex. folded_text is
+    fold(text) if the caller has it.
+    """
     term = str(term)
-    pattern = '.{0,%i}' % max_distance
-    pattern = pattern.join(map(re.escape, term))
-    regex = re.compile(pattern, re.I)
-    match = regex.search(text)
+    if not term: return Result(term, text, 0, 0, 0)
+
+    folded_term = _fold_term(term)
+    # only combining marks, nothing left to look for
+    if not folded_term: return Result(term, text, 0, 0, 0)
+
+    if folded_text is None: folded_text = fold(text)
+    folded, offsets = folded_text
+
+    # the earliest occurrences in order: a quick reject when the
+    # characters aren't there at all, and when they fit the gaps
+    # nothing can end before them
+    first_position = folded.find(folded_term[0])
+    if first_position < 0: return None
+
+    position = first_position
+    fits = True
+
+    for char in folded_term[1:]:
+        previous = position
+        position = folded.find(char, previous + 1)
+        if position < 0: return None
+        if position - previous - 1 > max_distance: fits = False
+
+    if (
+        fits and
+        '\n' not in folded_term and
+        folded.find('\n', first_position, position) < 0
+    ):
+        end = position + 1
+    else:
+        end = None
+
+    chars_re, indexes = _get_term_info(folded_term)
+
+    if end is None:
+        end = _find_end(folded_term, folded, max_distance, chars_re, indexes)
+        if end is None: return None
+
+    start = _find_start(
+        folded_term,
+        folded,
+        end,
+        max_distance,
+        chars_re,
+        indexes
+    )
 
-    if match:
-        score = len(match.group()) + match.start()
-        result = Result(term, text, score, match.start(), score)
+    if offsets is not None:
+        start = _get_original(offsets, start)
+        end = _get_original(offsets, end - 1) + 1
 
-    return result
+    return Result(term, text, end, start, end)
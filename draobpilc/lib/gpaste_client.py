@@ -15,6 +15,8 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import logging
+
 import dbus
 import dbus.mainloop.glib
 
@@ -22,17 +24,8 @@ from gi.repository import Gio
 
 from draobpilc import common
 from draobpilc.lib import utils
-
-
-class Action():
-    REPLACE = 'REPLACE'
-    REMOVE = 'REMOVE'
-
-
-class Target():
-    ALL = 'ALL'
-    POSITION = 'POSITION'
-
+from draobpilc.lib import tracing
+from draobpilc.lib.history_backend import Action, Target
 
 SCHEMA_ID = common.SETTINGS[common.GPASTE_SCHEMA_ID]
 try:
@@ -53,6 +46,7 @@ _client = dbus.Interface(
 )
 
 
+@tracing.traced(category='dbus')
 def get_prop(property_name):
 	return _gpaste_object.Get(
         common.SETTINGS[common.GPASTE_DBUS_IFACE],
@@ -73,74 +67,104 @@ def disconnect(signal_match):
     signal_match.remove()
 
 
+@tracing.traced(category='dbus')
 def add(text):
     return _client.Add(text)
 
 
+@tracing.traced(category='dbus')
 def get_history():
     return _client.GetHistory()
 
 
+@tracing.traced(category='dbus')
 def get_raw_history():
     return _client.GetRawHistory()
 
 
+@tracing.traced(category='dbus')
 def get_element(index):
     return _client.GetElement(index)
 
 
+@tracing.traced(category='dbus')
 def get_raw_element(index):
     return _client.GetRawElement(index)
 
 
+@tracing.traced(category='dbus')
 def select(index):
     return _client.Select(index)
 
 
+@tracing.traced(category='dbus')
 def get_element_kind(index):
     return _client.GetElementKind(index)
 
 
+@tracing.traced(category='dbus')
 def replace(index, contents):
     return _client.Replace(index, contents)
 
 
+@tracing.traced(category='dbus')
 def delete(index):
     return _client.Delete(index)
 
 
+@tracing.traced(category='dbus')
 def list_histories():
     histories = _client.ListHistories()
     return sorted(histories)
 
 
+@tracing.traced(category='dbus')
 def get_history_size(name):
     return _client.GetHistorySize(name)
 
 
+def get_history_size_async(name, callback):
+    """ doesn't wait for the reply, callback gets the size """
+    def on_error(error):
+        logging.warning('GetHistorySize("%s") failed: %s', name, error)
+
+    _client.GetHistorySize(
+        name,
+        reply_handler=lambda size: callback(int(size)),
+        error_handler=on_error
+    )
+
+
+@tracing.traced(category='dbus')
 def get_history_name():
     return _client.GetHistoryName()
 
 
+@tracing.traced(category='dbus')
 def switch_history(name):
     return _client.SwitchHistory(name)
 
 
+@tracing.traced(category='dbus')
 def delete_history(name):
     return _client.DeleteHistory(name)
 
 
+@tracing.traced(category='dbus')
 def empty_history(name):
     return _client.EmptyHistory(name)
 
 
+@tracing.traced(category='dbus')
 def track(t):
     return _client.Track(t)
 
 
+@tracing.traced(category='dbus')
 def reexecute():
     return _client.Reexecute()
 
 
+@tracing.traced(category='dbus')
 def backup_history(history_name, backup_name):
     return _client.BackupHistory(history_name, backup_name)
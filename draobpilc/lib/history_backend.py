@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+
+# Copyright 2016 Ivan awamper@gmail.com
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import time
+import collections
+
+from draobpilc.lib import history_files
+
+_default = None
+
+
+class Action():
+    REPLACE = 'REPLACE'
+    REMOVE = 'REMOVE'
+
+
+class Target():
+    ALL = 'ALL'
+    POSITION = 'POSITION'
+
+
+class InvalidIndex(Exception):
+    """ raise when a history element doesn't exist """
+
+
+class HistoryBackend():
+    """ the history storage the model layer talks to """
+
+    def connect(self, name, callback):
+        """ returns a match object with a remove() method """
+        raise NotImplementedError()
+
+    def disconnect(self, signal_match):
+        signal_match.remove()
+
+    def get_prop(self, property_name):
+        raise NotImplementedError()
+
+    def add(self, text):
+        raise NotImplementedError()
+
+    def get_history(self):
+        raise NotImplementedError()
+
+    def get_raw_history(self):
+        raise NotImplementedError()
+
+    def get_element(self, index):
+        raise NotImplementedError()
+
+    def get_raw_element(self, index):
+        raise NotImplementedError()
+
+    def get_element_kind(self, index):
+        raise NotImplementedError()
+
+    def select(self, index):
+        raise NotImplementedError()
+
+    def replace(self, index, contents):
+        raise NotImplementedError()
+
+    def delete(self, index):
+        raise NotImplementedError()
+
+    def list_histories(self):
+        raise NotImplementedError()
+
+    def get_history_size(self, name):
+        raise NotImplementedError()
+
+    def get_history_size_async(self, name, callback):
+        """ calls callback(size), backends without async calls wait """
+        callback(self.get_history_size(name))
+
+    def get_history_name(self):
+        raise NotImplementedError()
+
+    def switch_history(self, name):
+        raise NotImplementedError()
+
+    def delete_history(self, name):
+        raise NotImplementedError()
+
+    def empty_history(self, name):
+        raise NotImplementedError()
+
+    def backup_history(self, history_name, backup_name):
+        raise NotImplementedError()
+
+    def read_history(self, name):
+        """
+        Returns the stored (kind, raw, text) of any history, newest
+        first. Called from worker threads.
+        """
+        raise NotImplementedError()
+
+    def get_history_stamp(self, name):
+        """
+        A value that changes with the stored history, for caching
+        read_history(). Called from worker threads.
+        """
+        raise NotImplementedError()
+
+    def track(self, t):
+        raise NotImplementedError()
+
+    def reexecute(self):
+        raise NotImplementedError()
+
+
+class GPasteBackend(HistoryBackend):
+
+    def __init__(self):
+        # connects to the session bus on import
+        from draobpilc.lib import gpaste_client
+        self._client = gpaste_client
+
+    def connect(self, name, callback):
+        return self._client.connect(name, callback)
+
+    def disconnect(self, signal_match):
+        self._client.disconnect(signal_match)
+
+    def get_prop(self, property_name):
+        return self._client.get_prop(property_name)
+
+    def add(self, text):
+        return self._client.add(text)
+
+    def get_history(self):
+        return self._client.get_history()
+
+    def get_raw_history(self):
+        return self._client.get_raw_history()
+
+    def get_element(self, index):
+        return self._client.get_element(index)
+
+    def get_raw_element(self, index):
+        return self._client.get_raw_element(index)
+
+    def get_element_kind(self, index):
+        return self._client.get_element_kind(index)
+
+    def select(self, index):
+        return self._client.select(index)
+
+    def replace(self, index, contents):
+        return self._client.replace(index, contents)
+
+    def delete(self, index):
+        return self._client.delete(index)
+
+    def list_histories(self):
+        return self._client.list_histories()
+
+    def get_history_size(self, name):
+        return self._client.get_history_size(name)
+
+    def get_history_size_async(self, name, callback):
+        self._client.get_history_size_async(name, callback)
+
+    def get_history_name(self):
+        return self._client.get_history_name()
+
+    def switch_history(self, name):
+        return self._client.switch_history(name)
+
+    def delete_history(self, name):
+        return self._client.delete_history(name)
+
+    def empty_history(self, name):
+        return self._client.empty_history(name)
+
+    def backup_history(self, history_name, backup_name):
+        return self._client.backup_history(history_name, backup_name)
+
+    def read_history(self, name):
+        return history_files.read_history(history_files.get_history_path(name))
+
+    def get_history_stamp(self, name):
+        return history_files.get_stamp(history_files.get_history_path(name))
+
+    def track(self, t):
+        return self._client.track(t)
+
+    def reexecute(self):
+        return self._client.reexecute()
+
+
+class MemorySignalMatch():
+
+    def __init__(self, handlers, callback):
+        self._handlers = handlers
+        self._callback = callback
+
+    def remove(self):
+        try:
+            self._handlers.remove(self._callback)
+        except ValueError:
+            pass
+
+
+class MemoryBackend(HistoryBackend):
+    """
+    In-process history with GPaste semantics. "latency" seconds are
+    spent in every call to simulate a round trip, signals are
+    delivered synchronously.
+    """
+
+    VERSION = '3.18'
+    DEFAULT_HISTORY = 'history'
+
+    def __init__(self, entries=None, histories=None, latency=0):
+        # name -> list of (kind, raw, text), index 0 is the newest
+        self._histories = dict(histories or {})
+        self._name = MemoryBackend.DEFAULT_HISTORY
+        self._active = True
+        self._handlers = collections.defaultdict(list)
+
+        if entries is not None: self._histories[self._name] = list(entries)
+        self._histories.setdefault(self._name, [])
+
+        self.latency = latency
+        self.calls = collections.Counter()
+        self.latency_spent = 0
+
+    def _call(self, name):
+        self.calls[name] += 1
+        if not self.latency: return
+
+        started = time.perf_counter()
+        time.sleep(self.latency)
+        self.latency_spent += time.perf_counter() - started
+
+    def reset_stats(self):
+        self.calls.clear()
+        self.latency_spent = 0
+
+    def _emit(self, name, *args):
+        for callback in list(self._handlers[name]): callback(*args)
+
+    def _get(self, index):
+        try:
+            return self._history[index]
+        except IndexError:
+            raise InvalidIndex('Invalid index %i' % index)
+
+    def _push(self, entry):
+        history = self._history
+
+        for i, (kind, raw, text) in enumerate(history):
+            if raw != entry[1]: continue
+            history.pop(i)
+            break
+
+        history.insert(0, entry)
+        self._emit('Update', Action.REPLACE, Target.ALL, 0)
+
+    @property
+    def _history(self):
+        return self._histories[self._name]
+
+    def connect(self, name, callback):
+        self._handlers[name].append(callback)
+        return MemorySignalMatch(self._handlers[name], callback)
+
+    def get_prop(self, property_name):
+        self._call('get_prop')
+        return {'Active': self._active, 'Version': self.VERSION}[property_name]
+
+    def add(self, text):
+        self._call('add')
+        self._push(('Text', text, text))
+
+    def get_history(self):
+        self._call('get_history')
+        return [text for kind, raw, text in self._history]
+
+    def get_raw_history(self):
+        self._call('get_raw_history')
+        return [raw for kind, raw, text in self._history]
+
+    def get_element(self, index):
+        self._call('get_element')
+        return self._get(index)[2]
+
+    def get_raw_element(self, index):
+        self._call('get_raw_element')
+        return self._get(index)[1]
+
+    def get_element_kind(self, index):
+        self._call('get_element_kind')
+        return self._get(index)[0]
+
+    def select(self, index):
+        self._call('select')
+        self._push(self._get(index))
+
+    def replace(self, index, contents):
+        self._call('replace')
+        kind, raw, text = self._get(index)
+        if kind != 'Text': return
+
+        self._history[index] = (kind, contents, contents)
+        self._emit('Update', Action.REPLACE, Target.POSITION, index)
+
+    def delete(self, index):
+        self._call('delete')
+        self._get(index)
+        del self._history[index]
+        self._emit('Update', Action.REMOVE, Target.POSITION, index)
+
+    def list_histories(self):
+        self._call('list_histories')
+        return sorted(self._histories.keys())
+
+    def get_history_size(self, name):
+        self._call('get_history_size')
+        return len(self._histories.get(name, []))
+
+    def get_history_name(self):
+        self._call('get_history_name')
+        return self._name
+
+    def switch_history(self, name):
+        self._call('switch_history')
+        self._name = name
+        self._histories.setdefault(name, [])
+        self._emit('SwitchHistory', name)
+        self._emit('Update', Action.REPLACE, Target.ALL, 0)
+
+    def delete_history(self, name):
+        self._call('delete_history')
+        if name not in self._histories: return
+
+        if name == self._name:
+            self._histories[name] = []
+            self._emit('Update', Action.REMOVE, Target.ALL, 0)
+        else:
+            del self._histories[name]
+
+        self._emit('DeleteHistory', name)
+
+    def empty_history(self, name):
+        self._call('empty_history')
+        self._histories[name] = []
+        if name == self._name:
+            self._emit('Update', Action.REMOVE, Target.ALL, 0)
+
+    def backup_history(self, history_name, backup_name):
+        self._call('backup_history')
+        self._histories[backup_name] = list(
+            self._histories.get(history_name, [])
+        )
+
+    def read_history(self, name):
+        self._call('read_history')
+        return list(self._histories.get(name, []))
+
+    def get_history_stamp(self, name):
+        self._call('get_history_stamp')
+        history = self._histories.get(name, None)
+        if history is None: return None
+        return hash(tuple(history))
+
+    def track(self, t):
+        self._call('track')
+        self._active = bool(t)
+        self._emit('Tracking', self._active)
+
+    def reexecute(self):
+        self._call('reexecute')
+
+
+def get_default():
+    global _default
+    if _default is None: _default = GPasteBackend()
+    return _default
+
+
+def set_default(backend):
+    global _default
+
+    if not isinstance(backend, HistoryBackend):
+        raise ValueError('"backend" must be instance of HistoryBackend')
+
+    _default = backend
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+# Copyright 2015 Ivan awamper@gmail.com
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# Read-only access to the histories GPaste keeps on disk. Used for the
+# histories that aren't active, D-Bus only exposes the active one.
+# Doesn't touch GLib or D-Bus, so it's safe to call from any thread.
+
+import os
+import xml.etree.ElementTree as ElementTree
+
+from draobpilc.history_item_kind import HistoryItemKind
+
+# never indexed or shown outside of GPaste
+PASSWORD_KIND = 'Password'
+
+
+def get_histories_dir():
+    data_dir = os.environ.get('XDG_DATA_HOME', '')
+
+    if not os.path.isabs(data_dir):
+        data_dir = os.path.join(os.path.expanduser('~'), '.local', 'share')
+
+    return os.path.join(data_dir, 'gpaste')
+
+
+def get_history_path(name):
+    return os.path.join(get_histories_dir(), '%s.xml' % name)
+
+
+def get_stamp(path):
+    """ changes whenever GPaste rewrites the file, None if it's missing """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def read_history(path):
+    """
+    Returns a list of (kind, raw, text), the newest first. Both the
+    1.0 format (value in the item) and the 2.0 one (value in a
+    <value> child) are understood.
+    """
+    result = []
+
+    for event, element in ElementTree.iterparse(path):
+        if element.tag != 'item': continue
+
+        kind = element.get('kind', HistoryItemKind.TEXT)
+        value = element.find('value')
+        if value is not None: raw = value.text or ''
+        else: raw = element.text or ''
+        element.clear()
+
+        if kind == PASSWORD_KIND or not raw: continue
+
+        if kind == HistoryItemKind.FILE: text = '[Files] ' + raw
+        elif kind == HistoryItemKind.IMAGE: text = '[Image] ' + raw
+        else: text = raw
+
+        result.append((kind, raw, text))
+
+    return result
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+
+# Copyright 2016 Ivan awamper@gmail.com
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# Regular expression search in a separate process. Patterns come from
+# the user and can backtrack for ages, a thread couldn't be stopped:
+# the process is killed when a query runs out of time and a new one
+# is started right away. It keeps a copy of the texts between
+# queries, changes are sent along with the next query. Patterns are
+# only compiled here, a query is acknowledged once its pattern
+# compiled and the texts are in, so its time can be counted from
+# there. Matches are sent back while the texts are scanned, so a
+# query that times out still has the ones found before it got stuck.
+
+import re
+import logging
+import multiprocessing
+
+# matches are sent and new messages, which stop the scan, are
+# checked for after that many texts
+CHECK_INTERVAL = 256
+
+_ESCAPE_RE = re.compile(r'\\.')
+
+
+def compile_pattern(pattern):
+    """
+    Case insensitive unless the pattern has upper case letters.
+    Raises re.error for invalid patterns.
+    """
+    flags = re.MULTILINE
+    unescaped = _ESCAPE_RE.sub('', pattern)
+    if not any(char.isupper() for char in unescaped): flags |= re.IGNORECASE
+
+    return re.compile(pattern, flags)
+
+
+def _scan(connection, texts, query_id, pattern):
+    try:
+        regex = compile_pattern(pattern)
+    except re.error as e:
+        connection.send(('error', query_id, str(e)))
+        return
+
+    connection.send(('started', query_id))
+    matches = []
+
+    for n_scanned, (doc_id, text) in enumerate(texts.items(), 1):
+        match = regex.search(text)
+        if match: matches.append((doc_id, match.start(), match.end()))
+        if n_scanned % CHECK_INTERVAL: continue
+
+        # a new query or a cancel
+        if connection.poll(): return
+
+        if matches:
+            connection.send(('matches', query_id, matches))
+            matches = []
+
+    if matches: connection.send(('matches', query_id, matches))
+    connection.send(('done', query_id))
+
+
+def _serve(connection):
+    # document id -> text
+    texts = {}
+
+    while True:
+        try:
+            message = connection.recv()
+        except (EOFError, OSError):
+            break
+
+        if message is None: break
+        command, args = message[0], message[1:]
+
+        if command == 'update':
+            removed, added = args
+            for doc_id in removed: texts.pop(doc_id, None)
+            texts.update(added)
+        elif command == 'search':
+            _scan(connection, texts, *args)
+
+    connection.close()
+
+
+class RegexWorker():
+
+    def __init__(self):
+        # document id -> text, all of them go to a new process
+        self._texts = {}
+        self._removed = set()
+        self._added = {}
+        self._process = None
+        self._connection = None
+        self._query_id = 0
+
+    def _start(self):
+        context = multiprocessing.get_context('spawn')
+        self._connection, worker_connection = context.Pipe()
+        self._process = context.Process(
+            target=_serve,
+            args=(worker_connection,),
+            name='draobpilc-regex',
+            daemon=True
+        )
+        self._process.start()
+        worker_connection.close()
+
+        self._removed = set()
+        self._added = dict(self._texts)
+
+    def restart(self):
+        """
+        Replaces a killed process in the background, the texts go
+        along with the next query
+        """
+        self.kill()
+        self._start()
+
+    def add(self, doc_id, text):
+        self._texts[doc_id] = text
+        self._added[doc_id] = text
+
+    def remove(self, doc_id):
+        self._texts.pop(doc_id, None)
+        self._added.pop(doc_id, None)
+        self._removed.add(doc_id)
+
+    def search(self, pattern):
+        """
+        Starts a query in the background, replacing the current one.
+        Its messages come from receive(). Returns False if the
+        process is gone.
+        """
+        if not self._process: self._start()
+        self._query_id += 1
+
+        try:
+            if self._removed or self._added:
+                self._connection.send(
+                    ('update', list(self._removed), list(self._added.items()))
+                )
+                self._removed = set()
+                self._added = {}
+
+            self._connection.send(('search', self._query_id, pattern))
+        except OSError as e:
+            logging.warning('Regex search process is gone: %s', e)
+            self.kill()
+            return False
+
+        return True
+
+    def receive(self):
+        """
+        Messages of the current query that arrived so far, without
+        waiting: ('started',) once it compiled and the texts are in,
+        ('matches', [(document id, start, end)]), ('error', message)
+        for invalid patterns and lost processes and ('done',)
+        """
+        result = []
+
+        try:
+            while self._connection and self._connection.poll():
+                message = self._connection.recv()
+                if message[1] != self._query_id: continue
+
+                result.append((message[0],) + message[2:])
+        except (EOFError, OSError) as e:
+            logging.warning('Regex search process is gone: %s', e)
+            self.kill()
+            result.append(('error', str(e)))
+
+        return result
+
+    def cancel(self):
+        """ stops the scan, it would go on until the next query else """
+        self._query_id += 1
+        if not self._connection: return
+
+        try:
+            self._connection.send(('cancel',))
+        except OSError:
+            self.kill()
+
+    def kill(self):
+        """ for queries that took too long, see also restart() """
+        if self._connection: self._connection.close()
+        if self._process:
+            self._process.terminate()
+            self._process.join(1)
+
+        self._connection = None
+        self._process = None
+
+    def shutdown(self):
+        if self._connection:
+            try:
+                self._connection.send(None)
+            except OSError:
+                pass
+
+        if self._process: self._process.join(1)
+        self.kill()
+
+    @property
+    def running(self):
+        return self._process is not None
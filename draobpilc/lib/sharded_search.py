@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+
+# Copyright 2016 Ivan awamper@gmail.com
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# Fuzzy search over texts spread across worker processes, for
+# histories too big to score on one core while typing. Every worker
+# keeps its shard of the texts between queries, only what changed
+# since the last query is sent along with the next one. Shards
+# return their best results and they are merged here.
+#
+# Workers are spawned, not forked: the app has threads by then.
+
+import array
+import logging
+import multiprocessing
+
+from draobpilc.lib import fuzzy
+from draobpilc.lib import char_masks
+
+
+def get_best(results, limit):
+    """
+    The first limit of the sorted (score, ...) results and the ones
+    with the same score as the last of them, so ties are decided
+    by whoever merges
+    """
+    if len(results) <= limit: return results
+    if limit <= 0: return []
+
+    last_score = results[limit - 1][0]
+    end = limit
+
+    while end < len(results) and results[end][0] == last_score:
+        end += 1
+
+    return results[:end]
+
+
+class Shard():
+    """ texts of one worker, folded, with their character masks """
+
+    def __init__(self):
+        self._doc_ids = []
+        self._texts = []
+        # fuzzy.fold() of the texts
+        self._folded = []
+        self._masks = array.array('Q')
+        # document id -> position in the lists
+        self._positions = {}
+
+    def __len__(self):
+        return len(self._doc_ids)
+
+    def _add(self, doc_id, text):
+        position = self._positions.get(doc_id, None)
+        folded = fuzzy.fold(text)
+        mask = char_masks.get_mask(text)
+
+        if position is None:
+            self._positions[doc_id] = len(self._doc_ids)
+            self._doc_ids.append(doc_id)
+            self._texts.append(text)
+            self._folded.append(folded)
+            self._masks.append(mask)
+        else:
+            self._texts[position] = text
+            self._folded[position] = folded
+            self._masks[position] = mask
+
+    def _remove(self, doc_id):
+        position = self._positions.pop(doc_id, None)
+        if position is None: return
+
+        # the last one takes the free place
+        last_doc_id = self._doc_ids.pop()
+        last_text = self._texts.pop()
+        last_folded = self._folded.pop()
+        last_mask = self._masks.pop()
+
+        if last_doc_id != doc_id:
+            self._doc_ids[position] = last_doc_id
+            self._texts[position] = last_text
+            self._folded[position] = last_folded
+            self._masks[position] = last_mask
+            self._positions[last_doc_id] = position
+
+    def update(self, removed, added):
+        """ removed are applied first, added replace known texts """
+        for doc_id in removed: self._remove(doc_id)
+        for doc_id, text in added: self._add(doc_id, text)
+
+    def search(self, term, max_distance, limit):
+        """ best (score, document id, start, end), see get_best() """
+        results = []
+        texts = self._texts
+        folded = self._folded
+        doc_ids = self._doc_ids
+        mask = char_masks.get_mask(term)
+
+        for position in char_masks.find(self._masks, mask):
+            match = fuzzy.match(
+                term,
+                texts[position],
+                max_distance,
+                folded[position]
+            )
+            if not match: continue
+
+            results.append(
+                (match.score, doc_ids[position], match.start, match.end)
+            )
+
+        results.sort()
+        return get_best(results, limit)
+
+
+def _serve(connection):
+    shard = Shard()
+
+    while True:
+        try:
+            message = connection.recv()
+        except (EOFError, OSError):
+            break
+
+        if message is None: break
+        command, args = message[0], message[1:]
+
+        if command == 'update':
+            shard.update(*args)
+        elif command == 'search':
+            connection.send(shard.search(*args))
+
+    connection.close()
+
+
+class ShardedSearch():
+
+    def __init__(self, n_workers):
+        context = multiprocessing.get_context('spawn')
+        self._connections = []
+        self._processes = []
+        # per shard: ids to remove and id -> text to add
+        self._removed = []
+        self._added = []
+
+        for i in range(n_workers):
+            connection, worker_connection = context.Pipe()
+            process = context.Process(
+                target=_serve,
+                args=(worker_connection,),
+                name='draobpilc-search-%i' % i,
+                daemon=True
+            )
+            process.start()
+            worker_connection.close()
+
+            self._connections.append(connection)
+            self._processes.append(process)
+            self._removed.append(set())
+            self._added.append({})
+
+    def add(self, doc_id, text):
+        """ documents are assigned to shards by id """
+        self._added[doc_id % len(self._added)][doc_id] = text
+
+    def remove(self, doc_id):
+        shard = doc_id % len(self._added)
+        self._added[shard].pop(doc_id, None)
+        self._removed[shard].add(doc_id)
+
+    def _send_updates(self, max_texts=None):
+        """ returns True if some texts are left to send """
+        more = False
+
+        for shard, connection in enumerate(self._connections):
+            removed = self._removed[shard]
+            added = self._added[shard]
+            if not removed and not added: continue
+
+            if max_texts is None or len(added) <= max_texts:
+                texts = list(added.items())
+                self._added[shard] = {}
+            else:
+                texts = [added.popitem() for i in range(max_texts)]
+                more = True
+
+            connection.send(('update', list(removed), texts))
+            self._removed[shard] = set()
+
+        return more
+
+    def flush(self, max_texts=None):
+        """
+        Sends the pending changes now instead of with the next query,
+        at most max_texts texts per shard. Returns True if some are
+        left, see also "running".
+        """
+        try:
+            return self._send_updates(max_texts)
+        except OSError as e:
+            logging.warning('Search workers are gone: %s', e)
+            self.shutdown()
+            return False
+
+    def search(self, term, max_distance, limit):
+        """
+        Returns the best (score, document id, start, end) of all
+        shards, see get_best(), or None if the workers are gone
+        """
+        results = []
+
+        try:
+            self._send_updates()
+
+            for connection in self._connections:
+                connection.send(('search', term, max_distance, limit))
+            for connection in self._connections:
+                results.extend(connection.recv())
+        except (EOFError, OSError) as e:
+            logging.warning('Search workers are gone: %s', e)
+            self.shutdown()
+            return None
+
+        results.sort()
+        return get_best(results, limit)
+
+    def shutdown(self):
+        for connection in self._connections:
+            try:
+                connection.send(None)
+                connection.close()
+            except OSError:
+                pass
+
+        for process in self._processes:
+            process.join(1)
+            if process.is_alive(): process.terminate()
+
+        self._connections = []
+        self._processes = []
+
+    @property
+    def n_workers(self):
+        return len(self._processes)
+
+    @property
+    def running(self):
+        return bool(self._processes)
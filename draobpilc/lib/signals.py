@@ -17,6 +17,8 @@
 
 from blinker import Signal
 
+_shared_signals = {}
+
 
 class NameAlreadyExists(Exception):
     """ raise when attempt add signal with already taken name """
@@ -54,3 +56,36 @@ class Emitter():
         if not signal: raise SignalNotFound()
 
         signal.send(self, **kwargs)
+
+
+class SharedEmitter():
+    """
+    Emitter for objects created by the thousand: the signals listed in
+    SIGNALS are shared by all instances of a class and receivers are
+    filtered by sender, so instances carry no signal state
+    """
+
+    __slots__ = ()
+
+    SIGNALS = ()
+
+    def _get_signal(self, name):
+        if name not in self.SIGNALS: raise SignalNotFound()
+
+        key = (type(self), name)
+        signal = _shared_signals.get(key, None)
+
+        if signal is None:
+            signal = Signal()
+            _shared_signals[key] = signal
+
+        return signal
+
+    def connect(self, name, callback):
+        self._get_signal(name).connect(callback, sender=self)
+
+    def disconnect(self, name, callback):
+        self._get_signal(name).disconnect(callback, sender=self)
+
+    def emit(self, name, **kwargs):
+        self._get_signal(name).send(self, **kwargs)
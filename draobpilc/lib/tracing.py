@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+# Copyright 2016 Ivan awamper@gmail.com
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# Timing spans exported in the Chrome trace event format, load the
+# resulting file in chrome://tracing or https://ui.perfetto.dev
+
+import os
+import json
+import time
+import atexit
+import logging
+import tempfile
+import functools
+import threading
+
+ENV_VAR = 'DRAOBPILC_TRACE'
+MAX_EVENTS = 1000000
+
+_enabled = False
+_path = None
+_events = []
+_pid = os.getpid()
+_origin = time.perf_counter()
+
+
+class NullSpan():
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def set_arg(self, name, value):
+        pass
+
+
+_NULL_SPAN = NullSpan()
+
+
+class Span():
+
+    def __init__(self, name, category, args):
+        self.name = name
+        self.category = category
+        self.args = args
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        end = time.perf_counter()
+        if exc_type: self.args['error'] = exc_type.__name__
+        if len(_events) >= MAX_EVENTS: return False
+
+        event = {
+            'name': self.name,
+            'cat': self.category,
+            'ph': 'X',
+            'ts': (self._start - _origin) * 1000000,
+            'dur': (end - self._start) * 1000000,
+            'pid': _pid,
+            'tid': threading.get_ident()
+        }
+        if self.args: event['args'] = self.args
+        _events.append(event)
+
+        return False
+
+    def set_arg(self, name, value):
+        self.args[name] = value
+
+
+def span(name, category='app', **args):
+    if not _enabled: return _NULL_SPAN
+    return Span(name, category, args)
+
+
+def traced(name=None, category='app'):
+    def decorator(func):
+        span_name = name or '%s.%s' % (
+            func.__module__.rsplit('.', 1)[-1],
+            func.__qualname__
+        )
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled: return func(*args, **kwargs)
+
+            with Span(span_name, category, {}):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def is_enabled():
+    return _enabled
+
+
+def enable(path):
+    global _enabled
+    global _path
+
+    if not _enabled: atexit.register(save)
+    _path = path
+    _enabled = True
+
+
+def setup(debug=False):
+    path = os.environ.get(ENV_VAR)
+
+    if not path and debug:
+        path = os.path.join(
+            tempfile.gettempdir(),
+            'draobpilc-trace-%i.json' % _pid
+        )
+
+    if path: enable(path)
+
+
+def save(path=None):
+    path = path or _path
+    if not path: return False
+
+    trace = {
+        'traceEvents': list(_events),
+        'displayTimeUnit': 'ms'
+    }
+
+    with open(path, 'w', encoding='utf-8') as trace_file:
+        json.dump(trace, trace_file)
+
+    logging.info('Trace with %i events written to "%s"', len(_events), path)
+    return True
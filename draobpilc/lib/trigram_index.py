@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+
+# Copyright 2016 Ivan awamper@gmail.com
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# Inverted n-gram index over item texts used to narrow searches down
+# to a candidate set. Documents are identified by a hash of their
+# text, which lets the index be saved and reused after a restart:
+# texts that are still in the history get their postings back
+# without being scanned again.
+#
+# New texts are only registered by add(), their grams are collected
+# later by index_pending() in small time slices. Until then they
+# are always candidates, so results never depend on the progress.
+#
+# Every document also gets a character mask when it's added, see
+# char_masks. Fuzzy queries are answered from the masks when NumPy
+# is installed, they also keep pending and unindexed documents out
+# of the candidates.
+
+import os
+import time
+import array
+import pickle
+import hashlib
+import logging
+
+from draobpilc.lib import fuzzy
+from draobpilc.lib import char_masks
+
+VERSION = 3
+# texts longer than that aren't indexed and are always candidates
+MAX_INDEXED_CHARS = 10000
+# postings that much bigger than the current candidate set
+# aren't worth intersecting, the matcher will do the rest
+MAX_POSTING_RATIO = 16
+# compact when that part of the documents is dead
+MAX_DEAD_RATIO = 0.25
+
+_EMPTY = array.array('I')
+
+
+def get_hash(text):
+    digest = hashlib.md5(text.encode('utf-8', 'surrogatepass')).digest()
+    return int.from_bytes(digest[:8], 'little')
+
+
+def get_grams(text, contiguous=True):
+    """ 1-grams, and 3-grams when contiguous is True """
+    text = fuzzy.fold(text)[0]
+    grams = set(text)
+
+    if contiguous:
+        grams.update({text[i:i + 3] for i in range(len(text) - 2)})
+
+    return grams
+
+
+class TrigramIndex():
+
+    def __init__(self):
+        self._postings = {}
+        # document id -> text hash, None for free ids
+        self._doc_hashes = []
+        # free ids, reused before new ones
+        self._free_ids = []
+        # document id -> character mask, 0 for free and dead ids
+        self._masks = array.array('Q')
+        self._docs = {}
+        self._refs = {}
+        # indexed documents that are gone but still in the postings
+        self._dead = set()
+        # documents without postings, always candidates
+        self._unindexed = set()
+        self._pending = {}
+
+    def __len__(self):
+        return len(self._refs)
+
+    def _index_doc(self, doc_id, text):
+        postings = self._postings
+
+        for gram in get_grams(text):
+            posting = postings.get(gram, None)
+
+            if posting is None:
+                posting = array.array('I')
+                postings[gram] = posting
+
+            posting.append(doc_id)
+
+    def add(self, text):
+        """ returns the document id for text """
+        text_hash = get_hash(text)
+        doc_id = self._docs.get(text_hash, None)
+
+        if doc_id is None:
+            mask = char_masks.get_mask(text)
+
+            if self._free_ids:
+                doc_id = self._free_ids.pop()
+                self._doc_hashes[doc_id] = text_hash
+                self._masks[doc_id] = mask
+            else:
+                doc_id = len(self._doc_hashes)
+                self._doc_hashes.append(text_hash)
+                self._masks.append(mask)
+
+            self._docs[text_hash] = doc_id
+
+            if len(text) > MAX_INDEXED_CHARS: self._unindexed.add(doc_id)
+            else: self._pending[doc_id] = text
+        else:
+            self._dead.discard(doc_id)
+            if not self._masks[doc_id]:
+                self._masks[doc_id] = char_masks.get_mask(text)
+
+        self._refs[doc_id] = self._refs.get(doc_id, 0) + 1
+        return doc_id
+
+    def remove(self, doc_id):
+        refs = self._refs.get(doc_id, 0) - 1
+
+        if refs > 0:
+            self._refs[doc_id] = refs
+        else:
+            self._refs.pop(doc_id, None)
+            self._kill(doc_id)
+
+    def _kill(self, doc_id):
+        self._masks[doc_id] = 0
+
+        if doc_id in self._pending or doc_id in self._unindexed:
+            self._pending.pop(doc_id, None)
+            self._unindexed.discard(doc_id)
+            self._docs.pop(self._doc_hashes[doc_id], None)
+            self._doc_hashes[doc_id] = None
+            self._free_ids.append(doc_id)
+            return
+
+        # postings are append-only, dead ids are dropped by compact()
+        self._dead.add(doc_id)
+
+        if len(self._dead) > max(len(self._refs), 1000) * MAX_DEAD_RATIO:
+            self.compact()
+
+    def index_pending(self, max_time=None):
+        """
+        Collects grams of the texts added since the last call, for at
+        most max_time seconds. Returns True if some are still left.
+        """
+        started = time.perf_counter()
+        n_indexed = 0
+
+        while self._pending:
+            doc_id, text = self._pending.popitem()
+            self._index_doc(doc_id, text)
+            n_indexed += 1
+
+            if (
+                max_time is not None and
+                n_indexed % 50 == 0 and
+                time.perf_counter() - started > max_time
+            ):
+                break
+
+        return bool(self._pending)
+
+    def prune(self):
+        """ drops the loaded documents that weren't added again """
+        for doc_id, text_hash in enumerate(self._doc_hashes):
+            if text_hash is None or doc_id in self._refs: continue
+            self._kill(doc_id)
+
+        self.compact()
+
+    def clear(self):
+        self.__init__()
+
+    def compact(self):
+        """
+        Drops the dead documents, their ids are reused. Ids of the
+        others don't change.
+        """
+        dead = self._dead
+        if not dead: return
+
+        for gram in list(self._postings.keys()):
+            posting = array.array(
+                'I',
+                (doc_id for doc_id in self._postings[gram] if doc_id not in dead)
+            )
+
+            if posting: self._postings[gram] = posting
+            else: del self._postings[gram]
+
+        for doc_id in dead:
+            self._docs.pop(self._doc_hashes[doc_id], None)
+            self._doc_hashes[doc_id] = None
+            self._free_ids.append(doc_id)
+
+        self._dead = set()
+
+    def get_candidates(self, term, contiguous=False):
+        """
+        Returns the set of document ids that can match term, or None
+        when anything can. With contiguous the term has to be a
+        substring, 3-grams are used then, else only its characters
+        have to be present.
+        """
+        mask = char_masks.get_mask(term)
+        # empty once folded
+        if not mask: return None
+
+        if not contiguous and char_masks.NUMPY_INSTALLED:
+            return set(char_masks.find(self._masks, mask))
+
+        term = fuzzy.fold(term)[0]
+
+        if contiguous and len(term) >= 3:
+            grams = {term[i:i + 3] for i in range(len(term) - 2)}
+        else:
+            grams = set(term)
+
+        postings = sorted(
+            (self._postings.get(gram, _EMPTY) for gram in grams),
+            key=len
+        )
+        result = set(postings[0])
+
+        for posting in postings[1:]:
+            if not result: break
+            if len(posting) > len(result) * MAX_POSTING_RATIO: break
+            result.intersection_update(posting)
+
+        result.difference_update(self._dead)
+        masks = self._masks
+
+        for doc_ids in (self._unindexed, self._pending.keys()):
+            result.update(
+                doc_id for doc_id in doc_ids
+                if masks[doc_id] & mask == mask
+            )
+
+        return result
+
+    def get_size(self):
+        """ number of postings entries """
+        return sum(len(posting) for posting in self._postings.values())
+
+    @property
+    def has_pending(self):
+        return bool(self._pending)
+
+    def save(self, path):
+        """ pending documents are left out, they'll be added again """
+        self.compact()
+        doc_hashes = self._doc_hashes
+        masks = self._masks
+        postings = self._postings
+        unindexed = self._unindexed
+
+        if self._pending or None in doc_hashes:
+            # renumber the saved copy densely
+            new_ids = {}
+
+            for doc_id, text_hash in enumerate(doc_hashes):
+                if text_hash is None or doc_id in self._pending: continue
+                new_ids[doc_id] = len(new_ids)
+
+            doc_hashes = [doc_hashes[doc_id] for doc_id in new_ids]
+            masks = array.array('Q', (masks[doc_id] for doc_id in new_ids))
+            postings = {
+                gram: array.array('I', (new_ids[doc_id] for doc_id in posting))
+                for gram, posting in postings.items()
+            }
+            unindexed = {new_ids[doc_id] for doc_id in unindexed}
+
+        state = {
+            'version': VERSION,
+            'max_indexed_chars': MAX_INDEXED_CHARS,
+            'doc_hashes': doc_hashes,
+            'masks': masks.tobytes(),
+            'unindexed': unindexed,
+            'postings': {
+                gram: posting.tobytes() for gram, posting in postings.items()
+            }
+        }
+        directory = os.path.dirname(path)
+        if directory: os.makedirs(directory, exist_ok=True)
+        temp_path = path + '.tmp'
+
+        with open(temp_path, 'wb') as index_file:
+            pickle.dump(state, index_file, pickle.HIGHEST_PROTOCOL)
+
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """ returns an empty index if path is missing or unusable """
+        index = cls()
+
+        try:
+            with open(path, 'rb') as index_file:
+                state = pickle.load(index_file)
+
+            if (
+                state['version'] != VERSION or
+                state['max_indexed_chars'] != MAX_INDEXED_CHARS
+            ):
+                return index
+
+            for gram, data in state['postings'].items():
+                posting = array.array('I')
+                posting.frombytes(data)
+                index._postings[gram] = posting
+
+            index._doc_hashes = list(state['doc_hashes'])
+            index._masks.frombytes(state['masks'])
+            if len(index._masks) != len(index._doc_hashes):
+                raise ValueError('masks don\'t match the documents')
+
+            index._docs = {
+                text_hash: doc_id
+                for doc_id, text_hash in enumerate(index._doc_hashes)
+                if text_hash is not None
+            }
+            index._free_ids = [
+                doc_id
+                for doc_id, text_hash in enumerate(index._doc_hashes)
+                if text_hash is None
+            ]
+            index._unindexed = set(state['unindexed'])
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logging.warning('Can\'t load the search index "%s": %s', path, e)
+            index = cls()
+
+        return index
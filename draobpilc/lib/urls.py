@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+# Copyright 2015 Ivan awamper@gmail.com
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# URL extraction, adopted from django's urlize. Only the words that
+# can possibly be a URL are looked at, everything else is skipped
+# by a single regex pass.
+
+import re
+import functools
+
+# longer strings are never considered a URL by is_url()
+MAX_URL_LENGTH = 2048
+
+simple_url_re = re.compile(r'^https?://\[?\w', re.IGNORECASE)
+simple_url_2_re = re.compile(
+    r'^www\.|^(?!http)\w[^@]+\.(com|edu|gov|int|mil|net|org)($|/.*)$',
+    re.IGNORECASE
+)
+# whole words (runs between whitespace, <, >, " and ') that contain
+# a ".", ":" or "@", the lookbehind anchors matches to word starts
+# so the scan stays linear
+candidate_re = re.compile(
+    r'''(?<![^\s<>"'])[^\s<>"'.:@]*[.:@][^\s<>"']*'''
+)
+whitespace_re = re.compile(r'\s')
+
+TRAILING_PUNCTUATION = ('.', ',', ':', ';', '.)', '"', '\'', '!')
+WRAPPING_PUNCTUATION = (
+    ('(', ')'),
+    ('<', '>'),
+    ('[', ']'),
+    ('&lt;', '&gt;'),
+    ('"', '"'),
+    ('\'', '\'')
+)
+
+
+def _unescape(text, trail):
+    """
+    If input URL is HTML-escaped, unescape it so as we can safely feed it to
+    smart_urlquote. For example:
+    http://example.com?x=1&amp;y=&lt;2&gt; => http://example.com?x=1&y=<2>
+    """
+    unescaped = (text + trail).replace(
+        '&amp;', '&').replace('&lt;', '<').replace(
+        '&gt;', '>').replace('&quot;', '"').replace('&#39;', "'")
+    if trail and unescaped.endswith(trail):
+        # Remove trail for unescaped if it was not consumed by unescape
+        unescaped = unescaped[:-len(trail)]
+    elif trail == ';':
+        # Trail was consumed by unescape (as end-of-entity marker),
+        # move it to text
+        text += trail
+        trail = ''
+    return text, unescaped, trail
+
+
+def _get_url(word):
+    lead, middle, trail = '', word, ''
+
+    for punctuation in TRAILING_PUNCTUATION:
+        if middle.endswith(punctuation):
+            middle = middle[:-len(punctuation)]
+            trail = punctuation + trail
+
+    for opening, closing in WRAPPING_PUNCTUATION:
+        if middle.startswith(opening):
+            middle = middle[len(opening):]
+            lead = lead + opening
+
+        # Keep parentheses at the end only if they're balanced.
+        if (
+            middle.endswith(closing)
+            and middle.count(closing) == middle.count(opening) + 1
+        ):
+            middle = middle[:-len(closing)]
+            trail = closing + trail
+
+    url = None
+
+    if simple_url_re.match(middle):
+        middle, middle_unescaped, trail = _unescape(middle, trail)
+        url = middle_unescaped
+    elif simple_url_2_re.match(middle):
+        middle, middle_unescaped, trail = _unescape(middle, trail)
+        url = 'http://%s' % middle_unescaped
+
+    return url
+
+
+def extract_urls(text):
+    # most clipboard entries can't contain a URL at all
+    if '.' not in text and ':' not in text and '@' not in text: return []
+
+    result = []
+
+    for match in candidate_re.finditer(text):
+        url = _get_url(match.group())
+        if url: result.append(url)
+
+    return result
+
+
+@functools.lru_cache(maxsize=4096)
+def _is_url(string):
+    urls = extract_urls(string)
+    return len(urls) == 1 and len(urls[0]) == len(string)
+
+
+def is_url(string):
+    """ only a single word, with no surrounding whitespace, is a URL """
+    if (
+        not string or
+        len(string) > MAX_URL_LENGTH or
+        whitespace_re.search(string)
+    ):
+        return False
+
+    return _is_url(string)
@@ -16,7 +16,6 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import os
-import re
 import sys
 import subprocess
 
@@ -29,12 +28,6 @@ from draobpilc.version import APP_NAME
 
 Notify.init(APP_NAME)
 
-simple_url_re = re.compile(r'^https?://\[?\w', re.IGNORECASE)
-simple_url_2_re = re.compile(
-    r'^www\.|^(?!http)\w[^@]+\.(com|edu|gov|int|mil|net|org)($|/.*)$',
-    re.IGNORECASE
-)
-
 
 class SettingsSchemaNotFound(Exception):
     """ """
@@ -125,87 +118,6 @@ def get_settings(schema_id, schema_dir=None):
     return Gio.Settings(settings_schema=settings)
 
 
-def is_url(string):
-    result = False
-    urls = extract_urls(string)
-
-    if len(urls) == 1 and len(urls[0]) == len(string):
-        result = True
-
-    return result
-
-
-# adopted from django
-def extract_urls(text):
-    def unescape(text, trail):
-        """
-        If input URL is HTML-escaped, unescape it so as we can safely feed it to
-        smart_urlquote. For example:
-        http://example.com?x=1&amp;y=&lt;2&gt; => http://example.com?x=1&y=<2>
-        """
-        unescaped = (text + trail).replace(
-            '&amp;', '&').replace('&lt;', '<').replace(
-            '&gt;', '>').replace('&quot;', '"').replace('&#39;', "'")
-        if trail and unescaped.endswith(trail):
-            # Remove trail for unescaped if it was not consumed by unescape
-            unescaped = unescaped[:-len(trail)]
-        elif trail == ';':
-            # Trail was consumed by unescape (as end-of-entity marker),
-            # move it to text
-            text += trail
-            trail = ''
-        return text, unescaped, trail
-
-    trailing_punctuation = ['.', ',', ':', ';', '.)', '"', '\'', '!']
-    wrapping_punctuation = [
-        ('(', ')'),
-        ('<', '>'),
-        ('[', ']'),
-        ('&lt;', '&gt;'),
-        ('"', '"'),
-        ('\'', '\'')
-    ]
-    word_split_re = re.compile(r'''([\s<>"']+)''')
-    result = []
-    words = word_split_re.split(text)
-
-    for i, word in enumerate(words):
-        if '.' in word or '@' in word or ':' in word:
-            # Deal with punctuation.
-            lead, middle, trail = '', word, ''
-
-            for punctuation in trailing_punctuation:
-                if middle.endswith(punctuation):
-                    middle = middle[:-len(punctuation)]
-                    trail = punctuation + trail
-
-            for opening, closing in wrapping_punctuation:
-                if middle.startswith(opening):
-                    middle = middle[len(opening):]
-                    lead = lead + opening
-
-                # Keep parentheses at the end only if they're balanced.
-                if (
-                    middle.endswith(closing)
-                    and middle.count(closing) == middle.count(opening) + 1
-                ):
-                    middle = middle[:-len(closing)]
-                    trail = closing + trail
-
-            url = None
-
-            if simple_url_re.match(middle):
-                middle, middle_unescaped, trail = unescape(middle, trail)
-                url = middle_unescaped
-            elif simple_url_2_re.match(middle):
-                middle, middle_unescaped, trail = unescape(middle, trail)
-                url = 'http://%s' % middle_unescaped
-
-            if url: result.append(url)
-
-    return result
-
-
 def is_pointer_inside_widget(widget, x=None, y=None):
     result = False
     window = widget.get_window()
@@ -28,6 +28,7 @@ from draobpilc import get_data_path
 from draobpilc import common
 from draobpilc import version
 from draobpilc.lib import utils
+from draobpilc.lib import tracing
 
 DESKTOP_FILE_PATH = os.path.join(
     os.path.expanduser('~/.local/share/applications'),
@@ -149,7 +150,9 @@ def run():
     parser.add_argument('-d', '--debug',
         action='store_true',
         default=False,
-        dest='debug'
+        dest='debug',
+        help=_('Verbose logging, also writes a Chrome trace on exit '
+               '(the path can be set with $%s)') % tracing.ENV_VAR
     )
     parser.add_argument('--install-desktop-file',
         action='store_true',
@@ -197,6 +200,8 @@ def run():
             datefmt=time_f
         )
 
+    tracing.setup(args.debug)
+
     if args.install_desktop_file:
         install_desktop_file()
         sys.exit()
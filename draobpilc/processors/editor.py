@@ -20,7 +20,7 @@ import os
 from gi.repository import Gtk
 
 from draobpilc.history_item_kind import HistoryItemKind
-from draobpilc.lib import gpaste_client
+from draobpilc.lib import history_backend
 from draobpilc.processors.processor_textwindow import TextWindow
 from draobpilc.widgets.items_processor_base import (
     ItemsProcessorBase,
@@ -50,7 +50,7 @@ class Editor(ItemsProcessorBase):
         contents = self._text_window.buffer.props.text
 
         if contents and contents != self.item.raw:
-            gpaste_client.replace(self.item.index, contents)
+            history_backend.get_default().replace(self.item.index, contents)
 
     def clear(self):
         super().clear()
@@ -66,7 +66,8 @@ class Editor(ItemsProcessorBase):
 
     def can_process(self, items):
         if (
-            len(items) == 1 and (
+            len(items) == 1 and
+            items[0].history_name is None and (
                 items[0].kind == HistoryItemKind.TEXT or
                 items[0].kind == HistoryItemKind.LINK
             )
@@ -17,7 +17,7 @@
 
 from gi.repository import Gtk
 
-from draobpilc.lib import gpaste_client
+from draobpilc.lib import history_backend
 
 
 class BackupHistoryDialog(Gtk.Dialog):
@@ -38,7 +38,8 @@ class BackupHistoryDialog(Gtk.Dialog):
             Gtk.ResponseType.CANCEL
         )
 
-        self._current_name = current_name or gpaste_client.get_history_name()
+        self._backend = history_backend.get_default()
+        self._current_name = current_name or self._backend.get_history_name()
         backup_name = self._current_name + _('_backup')
 
         self._label = Gtk.Label()
@@ -88,7 +89,7 @@ class BackupHistoryDialog(Gtk.Dialog):
         self._error_label.show()
 
     def _backup_history(self, name):
-        histories = gpaste_client.list_histories()
+        histories = self._backend.list_histories()
 
         if name in histories:
             msg = _('Name "%s" already exists.') % name
@@ -96,6 +97,6 @@ class BackupHistoryDialog(Gtk.Dialog):
             self._show_error()
             return False
 
-        gpaste_client.backup_history(self._current_name, name)
+        self._backend.backup_history(self._current_name, name)
 
         return True
@@ -15,10 +15,12 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import functools
+
 from gi.repository import Gtk
 from gi.repository import GObject
 
-from draobpilc.lib import gpaste_client
+from draobpilc.lib import history_backend
 from draobpilc.widgets.backup_history_dialog import BackupHistoryDialog
 
 ITEM_BUTTON_SIZE = 14
@@ -100,18 +102,18 @@ class HistoriesManagerItem(Gtk.Box):
         'action-request': (GObject.SIGNAL_RUN_FIRST, None, (int,))
     }
 
-    def __init__(self, name):
+    def __init__(self, name, size=None):
         super().__init__()
 
         self.set_orientation(Gtk.Orientation.VERTICAL)
 
         self._wait_for_confirm = None
         self.name = name
-        self.size = gpaste_client.get_history_size(self.name)
+        self.size = None
 
         self.link = Gtk.LinkButton()
-        self.link.set_label(NAME_TEMPLATE % (self.name, self.size))
         self.link.set_halign(Gtk.Align.START)
+        self.set_size(size)
 
         self.backup_btn = ItemButton(
             'document-save-symbolic',
@@ -213,6 +215,13 @@ class HistoriesManagerItem(Gtk.Box):
     def set_active(self, active=False):
         self.link.set_sensitive(not active)
 
+    def set_size(self, size):
+        """ None while the size is unknown """
+        self.size = size
+
+        if size is None: self.link.set_label(self.name)
+        else: self.link.set_label(NAME_TEMPLATE % (self.name, size))
+
 
 class HistoriesManager(Gtk.Box):
 
@@ -249,8 +258,17 @@ class HistoriesManager(Gtk.Box):
 
         self.add(self.link)
 
-        gpaste_client.connect('SwitchHistory', self.update)
-        gpaste_client.connect('DeleteHistory', self.update)
+        # history name -> HistoriesManagerItem
+        self._rows = {}
+        # history name -> last known size, shown until a fresh one comes
+        self._sizes = {}
+        self._stale_sizes = set()
+        self._current_name = None
+
+        self._backend = history_backend.get_default()
+        self._backend.connect('SwitchHistory', self.update)
+        self._backend.connect('DeleteHistory', self.update)
+        self._backend.connect('Update', self._on_update)
         self.update()
 
     def _on_entry_activate(self, entry):
@@ -269,54 +287,101 @@ class HistoriesManager(Gtk.Box):
 
     def _on_item_action(self, histories_manager_item, action):
         if action == ItemAction.EMPTY:
-            gpaste_client.empty_history(histories_manager_item.name)
+            self._backend.empty_history(histories_manager_item.name)
+            self._stale_sizes.add(histories_manager_item.name)
             self.update()
         elif action == ItemAction.DELETE:
-            gpaste_client.delete_history(histories_manager_item.name)
+            self._backend.delete_history(histories_manager_item.name)
         elif action == ItemAction.BACKUP:
             dialog = BackupHistoryDialog(
                 self.get_toplevel(),
                 histories_manager_item.name
             )
             dialog.run()
+            self.update()
         else:
             pass
 
+    def _on_update(self, *args, **kwargs):
+        # only the active history changes
+        self._stale_sizes.add(self._current_name)
+        if self.popover.get_visible(): self._fetch_sizes()
+
+    def _on_size(self, name, size):
+        self._sizes[name] = size
+        row = self._rows.get(name, None)
+        if row: row.set_size(size)
+
     def _set_active(self, name):
         self.link.set_label(name)
 
-    def _clear(self):
-        for child in self._box:
-            if child != self._entry: child.destroy()
+    def _add_row(self, name):
+        histories_manager_item = HistoriesManagerItem(
+            name,
+            self._sizes.get(name, None)
+        )
+        histories_manager_item.link.connect(
+            'activate-link',
+            self._on_histories_manager_item,
+            histories_manager_item
+        )
+        histories_manager_item.connect(
+            'action-request',
+            self._on_item_action
+        )
+        self._box.add(histories_manager_item)
+        self._rows[name] = histories_manager_item
+
+        return histories_manager_item
+
+    def _fetch_sizes(self):
+        """ all requests are sent at once, rows fill in on reply """
+        stale = self._stale_sizes
+        self._stale_sizes = set()
+
+        for name in stale:
+            if name not in self._rows: continue
+
+            self._backend.get_history_size_async(
+                name,
+                functools.partial(self._on_size, name)
+            )
 
     def _switch_history(self, name):
-        gpaste_client.switch_history(name)
+        self._backend.switch_history(name)
         self.popover.hide()
 
     def update(self, *args, **kwargs):
-        self._clear()
+        """ only rows of added or removed histories are touched """
         self.link.set_sensitive(True)
-        histories = gpaste_client.list_histories()
-        current_name = gpaste_client.get_history_name()
-
-        for history_name in histories:
-            histories_manager_item = HistoriesManagerItem(history_name)
-            histories_manager_item.link.connect(
-                'activate-link',
-                self._on_histories_manager_item,
-                histories_manager_item
-            )
-            histories_manager_item.connect(
-                'action-request',
-                self._on_item_action
-            )
-            self._box.add(histories_manager_item)
+        histories = self._backend.list_histories()
+        self._current_name = self._backend.get_history_name()
+        self._stale_sizes.add(self._current_name)
+        names = set(histories)
 
-            if history_name == current_name:
-                self._set_active(history_name)
-                histories_manager_item.set_active(True)
+        for name in list(self._rows.keys()):
+            if name in names: continue
+
+            self._rows.pop(name).destroy()
+            self._sizes.pop(name, None)
+
+        for position, history_name in enumerate(histories):
+            histories_manager_item = self._rows.get(history_name, None)
+
+            if histories_manager_item is None:
+                histories_manager_item = self._add_row(history_name)
+                self._stale_sizes.add(history_name)
+
+            # the entry stays on top
+            self._box.reorder_child(histories_manager_item, position + 1)
+            histories_manager_item.set_active(
+                history_name == self._current_name
+            )
 
+        if self._current_name in names: self._set_active(self._current_name)
         self._box.show_all()
+        if self.popover.get_visible(): self._fetch_sizes()
 
     def show(self):
         self.popover.show()
+        self._fetch_sizes()
@@ -58,7 +58,7 @@ class ItemKindIndicator(IndicatorBase):
         self.set_name('HistoryItemKindIndicator')
         self.set_halign(Gtk.Align.START)
         self.set_hexpand(False)
-        self.set_size_request(common.SETTINGS[common.KIND_INDICATOR_WIDTH], -1)
+        self.set_size_request(common.SNAPSHOT.kind_indicator_width, -1)
         self.set_kind(kind)
         self.show()
 
@@ -76,7 +76,7 @@ class ItemLabel(Gtk.Label):
         self.set_ellipsize(Pango.EllipsizeMode.END)
         self.set_line_wrap(True)
         self.set_line_wrap_mode(Pango.WrapMode.CHAR)
-        self.set_lines(common.SETTINGS[common.ITEM_MAX_LINES])
+        self.set_lines(common.SNAPSHOT.item_max_lines)
 
 
 class Infobox(Gtk.Box):
@@ -318,12 +318,12 @@ class HistoryItemView(Gtk.Box):
 
         if (
             self.item.thumb_path and
-            common.SETTINGS[common.SHOW_THUMBNAILS]
+            common.SNAPSHOT.show_thumbnails
         ):
             self._preview = ItemThumb(
                 self.item.thumb_path,
                 -1,
-                common.SETTINGS[common.ITEM_MAX_HEIGHT]
+                common.SNAPSHOT.item_max_height
             )
             self._grid.attach(self._preview, 1, 1, 1, 2)
 
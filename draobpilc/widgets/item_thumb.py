@@ -19,6 +19,7 @@ from gi.repository import Gtk
 from gi.repository import GdkPixbuf
 
 from draobpilc import common
+from draobpilc.lib import tracing
 
 MARGIN = common.SETTINGS[common.ITEM_PREVIEW_MARGIN]
 DEFAULT_WIDTH = (
@@ -69,6 +70,7 @@ class ItemThumb(Gtk.Image):
         if new_pixbuf: self.set_from_pixbuf(new_pixbuf)
 
     @staticmethod
+    @tracing.traced(category='thumbnail')
     def get_pixbuf(
         filename,
         max_width=DEFAULT_WIDTH,
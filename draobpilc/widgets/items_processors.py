@@ -18,6 +18,7 @@
 from gi.repository import Gtk
 from gi.repository import GLib
 
+from draobpilc.lib import tracing
 from draobpilc.widgets.items_processor_base import ItemsProcessorBase
 
 
@@ -122,7 +123,13 @@ class ItemsProcessors(Gtk.Box):
                 else:
                     if processor.can_process(items):
                         processor.set_sensitive(True)
-                        processor.set_items(items)
+
+                        with tracing.span(
+                            '%s.set_items' % type(processor).__name__,
+                            'processor',
+                            n_items=len(items)
+                        ):
+                            processor.set_items(items)
                     else:
                         processor.set_sensitive(False)
                         processor.clear()
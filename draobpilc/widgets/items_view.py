@@ -23,6 +23,7 @@ from gi.repository import GObject
 from draobpilc import common
 from draobpilc.lib import utils
 from draobpilc.lib import fuzzy
+from draobpilc.lib import tracing
 from draobpilc.widgets.histories_manager import HistoriesManager
 from draobpilc.widgets.items_counter import ItemsCounter
 
@@ -59,6 +60,8 @@ class ItemsView(Gtk.Box):
         self._last_selected_index = None
         self._show_index = None
         self._autoscroll_timeout_id = 0
+        # changes that came while hidden, see refresh()
+        self._stale = False
 
         self._histories_manager = HistoriesManager()
 
@@ -189,6 +192,11 @@ class ItemsView(Gtk.Box):
         if item: self.activate_item(item)
 
     def _on_changed(self, history_items):
+        # nobody sees the rows, refresh() updates them in the background
+        if not self.get_mapped():
+            self._stale = True
+            return
+
         self.show_items()
         self.set_active_item()
         self.resume_selection() or self.select_first()
@@ -266,14 +274,54 @@ class ItemsView(Gtk.Box):
 
         self.show_items()
 
+    def refresh(self):
+        """ brings the rows up to date if changes came while hidden """
+        if not self._stale: return False
+
+        self._stale = False
+        self.show_items()
+        return True
+
+    def _set_rows(self, widgets):
+        """
+        Makes the rows hold widgets in that order. Rows of widgets that
+        stay are kept, so a new copy only adds a row instead of
+        rebuilding all of them.
+        """
+        wanted = set(widgets)
+        rows = []
+
+        for row in self._listbox.get_children():
+            child = row.get_child()
+            if child in wanted:
+                rows.append(row)
+                continue
+
+            if child: row.remove(child)
+            row.destroy()
+
+        for position, widget in enumerate(widgets):
+            if position < len(rows) and rows[position].get_child() is widget:
+                continue
+
+            # kept, but out of order
+            row = widget.get_parent()
+            if row is not None:
+                row.remove(widget)
+                rows.remove(row)
+                row.destroy()
+
+            self._listbox.insert(widget, position)
+            rows.insert(position, widget.get_parent())
+
+    @tracing.traced(category='view')
     def show_items(self):
-        limit = common.SETTINGS[common.ITEMS_VIEW_LIMIT]
+        limit = common.SNAPSHOT.items_view_limit
         items = self._bound_history
         if limit: items = items[:limit]
-        self.clear()
 
-        for item in items:
-            self._listbox.add(item.widget)
+        self._listbox.unselect_all()
+        self._set_rows([item.widget for item in items])
 
         if len(items) < len(self._bound_history): 
             self._load_rest_btn.show()
@@ -282,8 +330,9 @@ class ItemsView(Gtk.Box):
 
         self.show_all()
 
+    @tracing.traced(category='view')
     def load_rest_items(self):
-        limit = common.SETTINGS[common.ITEMS_VIEW_LIMIT]
+        limit = common.SNAPSHOT.items_view_limit
         if not limit: return
 
         for item in self._bound_history[limit:]:
@@ -319,7 +368,9 @@ class ItemsView(Gtk.Box):
         self.set_active_item()
 
         for row in self._listbox.get_children():
-            if not row.get_activatable() or not row.get_mapped(): continue
+            # rows are unmapped while the window is prepared hidden
+            if not row.get_activatable() or not row.get_child_visible():
+                continue
 
             self._listbox.select_row(row)
             if grab_focus: row.grab_focus()
@@ -327,6 +378,12 @@ class ItemsView(Gtk.Box):
 
         self.reset_scroll()
 
+    def focus_selected(self):
+        """ see select_first(), done before the window is shown """
+        rows = self._listbox.get_selected_rows()
+        if rows: rows[0].grab_focus()
+        else: self.select_first(grab_focus=True)
+
     def get_selected(self):
         result = []
         rows = self._listbox.get_selected_rows()
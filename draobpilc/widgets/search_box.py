@@ -26,15 +26,17 @@ from draobpilc.history_item_kind import HistoryItemKind
 
 ENTRY_PLACE_HOLDER = _('Filter items (%s to focus)')
 ENTRY_PLACE_HOLDER = ENTRY_PLACE_HOLDER % common.SETTINGS[common.FOCUS_SEARCH]
-SEARCH_INDEX_RE = re.compile(r'^#([0-9]+)$')
-FLAGS_RE = re.compile(r'^(.*?)\-([lfit]+)$')
+SEARCH_INDEX_RE = re.compile(r'^#([0-9]+)(?:\-([0-9]+))?$')
+FLAGS_RE = re.compile(r'^(.*?)\-([lfita]+)$')
+REGEX_RE = re.compile(r'^/(.+)/$', re.DOTALL)
 
 
 class SearchBox(Gtk.Box):
 
     __gsignals__ = {
         'search-changed': (GObject.SIGNAL_RUN_FIRST, None, ()),
-        'search-index': (GObject.SIGNAL_RUN_FIRST, None, (int,))
+        # the first and the last index
+        'search-index': (GObject.SIGNAL_RUN_FIRST, None, (int, int))
     }
 
     def __init__(self):
@@ -52,14 +54,14 @@ class SearchBox(Gtk.Box):
         self.entry.set_halign(Gtk.Align.FILL)
         self.entry.set_valign(Gtk.Align.START)
         self.entry.set_placeholder_text(ENTRY_PLACE_HOLDER)
-        self.entry.connect(
-            'icon-release',
-            lambda *a, **kw: self.reset()
-        )
+        self.entry.connect('icon-release', self._on_icon_release)
         self.entry.set_tooltip_text(
             _('You can add "-{flags}" at the end to search for types.') +
             _('\n\tt - text\n\tl - links\n\tf - files\n\ti - images') +
-            _('\n\nUse #{number} to filter by index number')
+            _('\n\ta - search all histories') +
+            _('\n\nUse #{number} to filter by index number') +
+            _(', #{first}-{last} for a range') +
+            _('\n\nUse /{pattern}/ to search with a regular expression')
         )
 
         self.spinner = Gtk.Spinner()
@@ -75,6 +77,7 @@ class SearchBox(Gtk.Box):
 
         self._timeout_id = 0
         self.flags = []
+        self.all_histories = False
 
         self.add(overlay)
         self.show_all()
@@ -87,7 +90,10 @@ class SearchBox(Gtk.Box):
             match = SEARCH_INDEX_RE.findall(self.search_text)
 
             if match:
-                self.emit('search-index', int(match[0]))
+                first, last = match[0]
+                first = int(first)
+                last = int(last) if last else first
+                self.emit('search-index', min(first, last), max(first, last))
             else:
                 self.emit('search-changed')
 
@@ -98,12 +104,17 @@ class SearchBox(Gtk.Box):
             self._timeout_id = 0
 
         self._update_icon()
-        search_timeout = common.SETTINGS[common.SEARCH_TIMEOUT]
+        search_timeout = common.SNAPSHOT.search_timeout
         self._timeout_id = GLib.timeout_add(search_timeout, on_timeout)
 
+    def _on_icon_release(self, entry, icon_pos, event):
+        # the secondary icon only shows the status
+        if icon_pos == Gtk.EntryIconPosition.PRIMARY: self.reset()
+
     def _update_flags(self):
         flags = FLAGS_RE.findall(self.entry.get_text())
         self.flags.clear()
+        self.all_histories = False
 
         if not flags: return
         else: flags = flags[0][1]
@@ -112,6 +123,7 @@ class SearchBox(Gtk.Box):
         if 'f' in flags: self.flags.append(HistoryItemKind.FILE)
         if 'i' in flags: self.flags.append(HistoryItemKind.IMAGE)
         if 't' in flags: self.flags.append(HistoryItemKind.TEXT)
+        if 'a' in flags: self.all_histories = True
 
     def _update_icon(self):
         if self.entry.get_text():
@@ -136,6 +148,27 @@ class SearchBox(Gtk.Box):
     def reset(self):
         self.entry.set_text('')
 
+    def set_status(self, message=None):
+        """ a warning icon with message as its tooltip, None hides it """
+        if message:
+            self.entry.set_icon_from_icon_name(
+                Gtk.EntryIconPosition.SECONDARY,
+                'dialog-warning-symbolic'
+            )
+            self.entry.set_icon_activatable(
+                Gtk.EntryIconPosition.SECONDARY,
+                False
+            )
+            self.entry.set_icon_tooltip_text(
+                Gtk.EntryIconPosition.SECONDARY,
+                message
+            )
+        else:
+            self.entry.set_icon_from_icon_name(
+                Gtk.EntryIconPosition.SECONDARY,
+                None
+            )
+
     @property
     def buffer(self):
         return self.entry.props.buffer
@@ -145,3 +178,10 @@ class SearchBox(Gtk.Box):
         text = self.entry.get_text().strip()
         text = FLAGS_RE.sub(r'\1', text)
         return text
+
+    @property
+    def regex(self):
+        """ the pattern of a /pattern/ search, None for other searches """
+        match = REGEX_RE.match(self.search_text)
+        if match: return match.group(1)
+        return None
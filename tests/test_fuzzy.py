@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+# Copyright 2016 Ivan awamper@gmail.com
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+
+from draobpilc.lib import fuzzy
+from draobpilc.lib import trigram_index
+
+# a lone combining acute accent, nothing is left of it once folded
+COMBINING_MARK = '\u0301'
+
+
+class MatchTest(unittest.TestCase):
+
+    def test_folding(self):
+        result = fuzzy.match('cafe', 'un Café noir')
+        self.assertEqual((result.start, result.end), (3, 7))
+
+        result = fuzzy.match('strasse', 'die Straße')
+        self.assertEqual(result.original[result.start:result.end], 'Straße')
+
+    def test_combining_marks_only(self):
+        result = fuzzy.match(COMBINING_MARK, 'some text')
+        self.assertEqual((result.score, result.start, result.end), (0, 0, 0))
+
+        result = fuzzy.match(COMBINING_MARK * 2, 'é')
+        self.assertEqual(result.score, 0)
+
+    def test_combining_marks_candidates(self):
+        index = trigram_index.TrigramIndex()
+        index.add('some text')
+        index.index_pending()
+
+        for contiguous in (False, True):
+            self.assertIsNone(
+                index.get_candidates(COMBINING_MARK, contiguous)
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+
+# Copyright 2016 Ivan awamper@gmail.com
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+
+from draobpilc.lib import history_backend
+from draobpilc import history_items
+from draobpilc.history_items import HistoryItems
+from draobpilc.history_item_kind import HistoryItemKind
+
+
+def get_entries(size):
+    return [
+        ('Text', 'example %i' % i, 'example %i' % i)
+        for i in range(size)
+    ]
+
+
+class QueryCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        history_backend.set_default(
+            history_backend.MemoryBackend(get_entries(100))
+        )
+        self.history_items = HistoryItems()
+
+    def tearDown(self):
+        self.history_items.shutdown()
+
+    def assert_counted(self):
+        query_cache = self.history_items._query_cache
+        self.assertEqual(
+            self.history_items._n_cached_matches,
+            sum(len(matches) for matches in query_cache.values())
+        )
+
+    def test_repeated_queries(self):
+        for term in ('e', 'ex', 'exa', 'ex', 'e'):
+            self.history_items.filter(term=term)
+            self.assert_counted()
+
+        self.assertEqual(len(self.history_items._query_cache), 3)
+
+    def test_hits_dont_evict(self):
+        max_matches = history_items.QUERY_CACHE_MAX_MATCHES
+        # room for two queries matching every item
+        history_items.QUERY_CACHE_MAX_MATCHES = 200
+
+        try:
+            for i in range(10):
+                self.history_items.filter(term='e')
+                self.assert_counted()
+
+            self.history_items.filter(term='ex')
+            self.assert_counted()
+        finally:
+            history_items.QUERY_CACHE_MAX_MATCHES = max_matches
+
+        self.assertEqual(len(self.history_items._query_cache), 2)
+
+
+
+class FreezeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.backend = history_backend.MemoryBackend(get_entries(100))
+        history_backend.set_default(self.backend)
+        self.history_items = HistoryItems()
+        self.history_items.connect('thawed', self.on_thawed)
+        self.n_thawed = 0
+        # Update signals not delivered yet, like the D-Bus ones
+        # that arrive from the main loop after the calls returned
+        self.held = []
+
+    def tearDown(self):
+        self.history_items.shutdown()
+
+    def on_thawed(self, history_items):
+        self.n_thawed += 1
+
+    def hold(self, name, *args):
+        if name == 'Update': self.held.append(args)
+        else: history_backend.MemoryBackend._emit(self.backend, name, *args)
+
+    def delete_held(self, *indexes):
+        self.backend._emit = self.hold
+
+        try:
+            for index in indexes: self.backend.delete(index)
+        finally:
+            del self.backend._emit
+
+    def deliver(self, n_updates):
+        for args in self.held[:n_updates]:
+            self.backend._emit('Update', *args)
+
+        del self.held[:n_updates]
+
+    def assert_synced(self):
+        self.assertEqual(
+            [item.raw for item in self.history_items._items],
+            self.backend.get_raw_history()
+        )
+        self.assertEqual(
+            [item.index for item in self.history_items._items],
+            list(range(len(self.backend.get_raw_history())))
+        )
+
+    def test_updates_before_thaw(self):
+        self.history_items.freeze(True)
+        self.backend.delete(3)
+        self.backend.delete(7)
+        self.history_items.freeze(False, expected_updates=2)
+
+        self.assertEqual(self.n_thawed, 1)
+        self.assert_synced()
+
+    def test_updates_after_thaw(self):
+        self.history_items.freeze(True)
+        self.delete_held(0, 0, 5)
+        self.history_items.freeze(False, expected_updates=3)
+        self.assertEqual(self.n_thawed, 0)
+
+        self.deliver(2)
+        self.assertEqual(self.n_thawed, 0)
+        self.deliver(1)
+        self.assertEqual(self.n_thawed, 1)
+        self.assert_synced()
+
+    def test_refreeze_keeps_counting(self):
+        self.history_items.freeze(True)
+        self.delete_held(0, 0)
+        self.history_items.freeze(False, expected_updates=2)
+
+        self.history_items.freeze(True)
+        self.delete_held(4)
+        self.history_items.freeze(False, expected_updates=1)
+
+        self.deliver(2)
+        self.assertEqual(self.n_thawed, 0)
+        self.deliver(1)
+        self.assertEqual(self.n_thawed, 1)
+        self.assert_synced()
+
+
+
+class HistoryCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        histories = {
+            'work': get_entries(50),
+            'home': [
+                ('Text', 'home %i' % i, 'home %i' % i)
+                for i in range(50)
+            ]
+        }
+        self.backend = history_backend.MemoryBackend(
+            get_entries(100),
+            histories
+        )
+        history_backend.set_default(self.backend)
+        self.history_items = HistoryItems()
+
+    def tearDown(self):
+        self.history_items.shutdown()
+
+    def switch(self, name):
+        self.backend.switch_history(name)
+        self.history_items.flush_updates()
+
+    def assert_synced(self):
+        self.assertEqual(
+            [item.raw for item in self.history_items._items],
+            self.backend.get_raw_history()
+        )
+
+    def test_switch_back(self):
+        items = list(self.history_items._items)
+        self.switch('work')
+        self.switch('history')
+
+        self.assertEqual(len(items), len(self.history_items._items))
+        for item, restored in zip(items, self.history_items._items):
+            self.assertIs(item, restored)
+
+    def test_changed_while_away(self):
+        items = set(self.history_items._items)
+        self.switch('work')
+        self.backend._histories['history'].insert(
+            0,
+            ('Text', 'fresh', 'fresh')
+        )
+        self.switch('history')
+
+        self.assert_synced()
+        self.assertEqual(self.history_items._items[0].raw, 'fresh')
+        # the rest are the cached items
+        self.assertTrue(items >= set(self.history_items._items[1:]))
+
+    def test_not_shared(self):
+        # 'work' has the same texts as the start of 'history'
+        self.switch('work')
+        self.assert_synced()
+        self.assertFalse(
+            set(self.history_items._items) &
+            set(self.history_items._history_cache['history'][0])
+        )
+
+    def test_size_bound(self):
+        items = list(self.history_items._items)
+
+        for name in ('work', 'home', 'a', 'b', 'c'):
+            self.switch(name)
+
+        self.assertEqual(
+            len(self.history_items._history_cache),
+            history_items.HISTORY_CACHE_SIZE
+        )
+        self.assertNotIn('history', self.history_items._history_cache)
+        # evicted items leave the search index
+        self.assertTrue(all(item.search_id is None for item in items))
+
+    def test_delete_history(self):
+        self.switch('work')
+        self.backend.delete_history('history')
+        self.assertNotIn('history', self.history_items._history_cache)
+
+
+
+class IndexFilterTest(unittest.TestCase):
+
+    def setUp(self):
+        entries = get_entries(100)
+        # every 10th one is a link
+        for i in range(0, 100, 10):
+            link = 'http://example.com/%i' % i
+            entries[i] = ('Text', link, link)
+
+        self.backend = history_backend.MemoryBackend(entries)
+        history_backend.set_default(self.backend)
+        self.history_items = HistoryItems()
+
+    def tearDown(self):
+        self.history_items.shutdown()
+
+    def get_indexes(self):
+        return [item.index for item in self.history_items._filter_result]
+
+    def test_single(self):
+        self.history_items.filter(index=5)
+        self.assertEqual(self.get_indexes(), [5])
+
+        self.history_items.filter(index=0)
+        self.assertEqual(self.get_indexes(), [0])
+
+    def test_range(self):
+        self.history_items.filter(index=range(10, 51))
+        self.assertEqual(self.get_indexes(), list(range(10, 51)))
+
+    def test_past_the_end(self):
+        self.history_items.filter(index=range(90, 200))
+        self.assertEqual(self.get_indexes(), list(range(90, 100)))
+
+        self.history_items.filter(index=range(150, 200))
+        self.assertEqual(self.get_indexes(), [])
+
+    def test_kinds(self):
+        self.history_items.filter(
+            kinds=[HistoryItemKind.LINK],
+            index=range(5, 45)
+        )
+        self.assertEqual(self.get_indexes(), [10, 20, 30, 40])
+
+    def test_after_deletes(self):
+        for index in (0, 17, 50): self.backend.delete(index)
+        self.history_items.flush_updates()
+
+        self.history_items.filter(index=range(15, 20))
+        self.assertEqual(
+            [item.raw for item in self.history_items._filter_result],
+            self.backend.get_raw_history()[15:20]
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
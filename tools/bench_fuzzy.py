@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+
+# Copyright 2016 Ivan awamper@gmail.com
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# Compares lib/fuzzy.py's matcher with the regex it replaced, on
+# synthetic histories and on inputs that make the regex backtrack.
+# The new one matches everything the regex did, with scores that
+# can only be lower (tighter), and more: it ignores diacritics.
+# "found" counts those. The app folds every text once, "fold ms"
+# is that and "new ms" matches on the folded texts.
+
+import os
+import re
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import synthetic_history
+from draobpilc.lib import fuzzy
+
+QUERIES = ('git', 'pyth', 'https', 'stra', 'xqz', 'deploy server')
+
+
+# match() before the rewrite, returns the score only
+def legacy_match(term, text, max_distance=30):
+    pattern = '.{0,%i}' % max_distance
+    pattern = pattern.join(map(re.escape, term))
+    match = re.compile(pattern, re.I).search(text)
+
+    if match: return len(match.group()) + match.start()
+    else: return None
+
+
+def get_cases(args):
+    entries = synthetic_history.generate(
+        args.size,
+        args.mean_length,
+        args.distribution,
+        args.kinds,
+        args.seed
+    )
+    texts = [text for kind, raw, text in entries]
+    cases = [('history "%s"' % query, query, texts) for query in QUERIES]
+
+    # every start backtracks through all gap lengths, the legacy
+    # time grows with the power of the term length
+    cases.append(('repeated, no match', 'aaab', ['a' * 200] * 10))
+    cases.append(('repeated, longer term', 'aaaab', ['a' * 100] * 2))
+    # many starts, the last character is missing or just out of reach
+    cases.append((
+        'near misses',
+        'abcdefgh',
+        [('abcdefg' + 'x' * 31) * 50] * 20
+    ))
+    cases.append((
+        'match at the end',
+        'abcd',
+        [('a' + 'z' * 40) * 100 + 'abcd'] * 20
+    ))
+    cases.append((
+        'long gaps',
+        'ab',
+        [('a' + ' ' * 25) * 400 + 'b'] * 20
+    ))
+
+    return cases
+
+
+def measure(func, term, texts, max_distance, repeat, folds=None):
+    best = None
+
+    for i in range(repeat):
+        started = time.perf_counter()
+        if folds is None:
+            for text in texts: func(term, text, max_distance)
+        else:
+            for text, folded in zip(texts, folds):
+                func(term, text, max_distance, folded)
+        elapsed = time.perf_counter() - started
+        if best is None or elapsed < best: best = elapsed
+
+    return best
+
+
+def check(term, texts, max_distance):
+    n_matches = 0
+    n_tighter = 0
+    n_found = 0
+
+    for text in texts:
+        legacy_score = legacy_match(term, text, max_distance)
+        match = fuzzy.match(term, text, max_distance)
+
+        if match is None:
+            if legacy_score is not None:
+                raise AssertionError('"%s" misses %r' % (term, text[:200]))
+            continue
+
+        n_matches += 1
+
+        # matched through folded characters
+        if legacy_score is None:
+            n_found += 1
+            continue
+
+        if match.score > legacy_score:
+            raise AssertionError('"%s" scores worse for %r' % (
+                term,
+                text[:200]
+            ))
+
+        if match.score < legacy_score: n_tighter += 1
+
+    return n_matches, n_tighter, n_found
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fuzzy matcher benchmark')
+    synthetic_history.add_arguments(parser)
+    parser.add_argument('--max-distance',
+        type=int,
+        default=30,
+        help='Max characters between two matched characters'
+    )
+    parser.add_argument('--repeat',
+        type=int,
+        default=3,
+        help='Best of that many runs is reported'
+    )
+    args = parser.parse_args()
+
+    print('%-28s %8s %8s %8s %8s %12s %12s %12s' % (
+        'case',
+        'texts',
+        'matches',
+        'tighter',
+        'found',
+        'legacy ms',
+        'fold ms',
+        'new ms'
+    ))
+
+    for name, term, texts in get_cases(args):
+        n_matches, n_tighter, n_found = check(
+            term,
+            texts,
+            args.max_distance
+        )
+
+        started = time.perf_counter()
+        folds = [fuzzy.fold(text) for text in texts]
+        fold_time = time.perf_counter() - started
+
+        print('%-28s %8i %8i %8i %8i %12.1f %12.1f %12.1f' % (
+            name,
+            len(texts),
+            n_matches,
+            n_tighter,
+            n_found,
+            measure(
+                legacy_match,
+                term,
+                texts,
+                args.max_distance,
+                args.repeat
+            ) * 1000,
+            fold_time * 1000,
+            measure(
+                fuzzy.match,
+                term,
+                texts,
+                args.max_distance,
+                args.repeat,
+                folds
+            ) * 1000
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+# Copyright 2016 Ivan awamper@gmail.com
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# Reports the memory held by HistoryItem objects, bytes per item,
+# for histories of different sizes. The copies of the contents the
+# items get from the backend are counted, the backend's own are not.
+
+import os
+import sys
+import gc
+import time
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import synthetic_history
+from draobpilc.lib import history_backend
+
+DEFAULT_SIZES = '10000,25000,50000,100000'
+
+
+class CopyingBackend(history_backend.MemoryBackend):
+    """ every call returns fresh strings, like D-Bus replies do """
+
+    def get_raw_element(self, index):
+        raw = super().get_raw_element(index)
+        return raw[:1] + raw[1:]
+
+    def get_element(self, index):
+        text = super().get_element(index)
+        return text[:1] + text[1:]
+
+
+def measure(size, args):
+    from draobpilc.history_item import HistoryItem
+
+    entries = synthetic_history.generate(
+        size,
+        args.mean_length,
+        args.distribution,
+        args.kinds,
+        args.seed
+    )
+    backend = CopyingBackend(entries)
+    history_backend.set_default(backend)
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    started = time.perf_counter()
+
+    items = [HistoryItem(index) for index in range(size)]
+
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    total = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    text_size = sum(len(item.raw) for item in items)
+
+    print('%7i items  %8.1f bytes/item  %6.1f bytes of raw/item  %8.1f MiB  %7.1f ms' % (
+        size,
+        total / size,
+        text_size / size,
+        total / 1024 / 1024,
+        elapsed * 1000
+    ))
+
+    return items
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HistoryItem memory benchmark')
+    synthetic_history.add_arguments(parser)
+    parser.add_argument('--sizes',
+        default=DEFAULT_SIZES,
+        help='Comma separated history sizes, overrides --size'
+    )
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    print('mean length %i, %s' % (args.mean_length, args.kinds))
+
+    for size in sizes:
+        items = measure(size, args)
+        del items
+
+
+if __name__ == '__main__':
+    main()
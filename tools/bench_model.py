@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+
+# Copyright 2016 Ivan awamper@gmail.com
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# Runs the history model on top of the in-memory backend and splits
+# the time of reload, search, delete and history switches into
+# simulated round trips and draobpilc's own code.
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import synthetic_history
+from draobpilc.lib import history_backend
+
+QUERIES = ('git', 'pyth', 'https', 'stra', 'xqz', 'deploy server')
+
+
+def measure(title, backend, func):
+    backend.reset_stats()
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    n_calls = sum(backend.calls.values())
+    backend_time = backend.latency_spent
+
+    print('%-24s %9.1f ms  %7i calls  %9.1f ms backend  %9.1f ms own' % (
+        title,
+        elapsed * 1000,
+        n_calls,
+        backend_time * 1000,
+        (elapsed - backend_time) * 1000
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='History model benchmark')
+    synthetic_history.add_arguments(parser)
+    parser.add_argument('--latency-ms',
+        type=float,
+        default=0.1,
+        help='Simulated round trip per backend call'
+    )
+    parser.add_argument('--burst',
+        type=int,
+        default=200,
+        help='Number of entries copied in one burst'
+    )
+    parser.add_argument('--delete',
+        type=int,
+        default=20,
+        help='Number of items deleted in one batch'
+    )
+    args = parser.parse_args()
+
+    entries = synthetic_history.generate(
+        args.size,
+        args.mean_length,
+        args.distribution,
+        args.kinds,
+        args.seed
+    )
+    other_entries = synthetic_history.generate(
+        args.size,
+        args.mean_length,
+        args.distribution,
+        args.kinds,
+        args.seed + 1
+    )
+    backend = history_backend.MemoryBackend(
+        entries,
+        histories={'other': list(other_entries)},
+        latency=args.latency_ms / 1000
+    )
+    history_backend.set_default(backend)
+
+    from draobpilc.history_items import HistoryItems
+    history_items = None
+
+    def load():
+        nonlocal history_items
+        history_items = HistoryItems()
+
+    def burst():
+        for i in range(args.burst):
+            backend.add('burst entry %i' % i)
+
+        history_items.flush_updates()
+
+    def delete():
+        history_items.freeze(True)
+
+        for i in range(args.delete):
+            backend.delete(0)
+
+        history_items.freeze(False)
+
+    def switch(name):
+        backend.switch_history(name)
+        history_items.flush_updates()
+
+    print('%i entries, %.2f ms latency' % (args.size, args.latency_ms))
+    measure('initial load', backend, load)
+    measure('reload (no changes)', backend, history_items.reload_history)
+
+    for query in QUERIES:
+        measure(
+            'filter "%s"' % query,
+            backend,
+            lambda: history_items.filter(term=query)
+        )
+
+    measure(
+        'filter "%s" (cached)' % QUERIES[0],
+        backend,
+        lambda: history_items.filter(term=QUERIES[0])
+    )
+    measure('reset filter', backend, history_items.reset_filter)
+    measure('burst of %i copies' % args.burst, backend, burst)
+    measure('delete %i items' % args.delete, backend, delete)
+    measure('switch history', backend, lambda: switch('other'))
+    measure('switch back (cached)', backend, lambda: switch('history'))
+    measure('switch again (cached)', backend, lambda: switch('other'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+# Copyright 2016 Ivan awamper@gmail.com
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# Query latency of lib/sharded_search.py with different numbers of
+# worker processes, against one shard searched in this process.
+# Shipping the texts happens with the first query and is reported
+# on its own. Scaling is bounded by the number of CPU cores.
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import synthetic_history
+from draobpilc.lib import sharded_search
+
+DEFAULT_WORKERS = '1,2,4,8'
+QUERIES = ('git', 'pyth', 'https', 'stra', 'xqz', 'deploy server')
+
+
+def measure(search, max_distance, limit, repeat):
+    """ term -> (best ms, results) """
+    timings = {}
+
+    for term in QUERIES:
+        best = None
+
+        for i in range(repeat):
+            started = time.perf_counter()
+            results = search(term, max_distance, limit)
+            elapsed = time.perf_counter() - started
+            if best is None or elapsed < best: best = elapsed
+
+        timings[term] = (best * 1000, results)
+
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sharded search benchmark')
+    synthetic_history.add_arguments(parser)
+    parser.set_defaults(size=100000)
+    parser.add_argument('--workers',
+        default=DEFAULT_WORKERS,
+        help='Comma separated numbers of worker processes'
+    )
+    parser.add_argument('--max-distance', type=int, default=15)
+    parser.add_argument('--limit',
+        type=int,
+        default=30,
+        help='Results per query, as "max-filter-results"'
+    )
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    texts = [
+        text for kind, raw, text in synthetic_history.generate(
+            args.size,
+            args.mean_length,
+            args.distribution,
+            args.kinds,
+            args.seed
+        )
+    ]
+    print('%i entries, %i CPU cores' % (len(texts), os.cpu_count() or 1))
+
+    shard = sharded_search.Shard()
+    shard.update([], list(enumerate(texts)))
+    local = measure(shard.search, args.max_distance, args.limit, args.repeat)
+    columns = [('local', local)]
+
+    for n_workers in [int(n) for n in args.workers.split(',') if n]:
+        search = sharded_search.ShardedSearch(n_workers)
+        for doc_id, text in enumerate(texts): search.add(doc_id, text)
+
+        started = time.perf_counter()
+        # nothing matches, the workers only take the texts
+        search.search('\x00', args.max_distance, args.limit)
+        print('%i workers: texts shipped in %.0f ms' % (
+            n_workers,
+            (time.perf_counter() - started) * 1000
+        ))
+
+        timings = measure(
+            search.search,
+            args.max_distance,
+            args.limit,
+            args.repeat
+        )
+        search.shutdown()
+
+        for term, (elapsed, results) in timings.items():
+            if results != local[term][1]:
+                raise AssertionError(
+                    '"%s": %i workers disagree with one shard' % (
+                        term,
+                        n_workers
+                    )
+                )
+
+        columns.append(('%i workers' % n_workers, timings))
+
+    print()
+    print('%-16s' % 'query' + ''.join('%12s' % name for name, t in columns))
+
+    for term in QUERIES:
+        print('%-16s' % term + ''.join(
+            '%12.1f' % timings[term][0] for name, timings in columns
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+
+# Copyright 2016 Ivan awamper@gmail.com
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# Memory footprint, build time and query latency of the search index
+# against synthetic histories, compared to scanning every item.
+# The build is done at once here, the app indexes new texts in
+# idle slices instead.
+
+import os
+import gc
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import synthetic_history
+from draobpilc.lib import fuzzy
+from draobpilc.lib import char_masks
+from draobpilc.lib import trigram_index
+
+DEFAULT_SIZES = '10000,100000'
+QUERIES = ('git', 'pyth', 'https', 'stra', 'xqz', 'deploy server', 'naïve c')
+
+
+def build(texts):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+
+    index = trigram_index.TrigramIndex()
+    for text in texts: index.add(text)
+    index.index_pending()
+
+    elapsed = time.perf_counter() - started
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    return index, elapsed, memory
+
+
+def measure_query(index, texts, term, max_distance):
+    started = time.perf_counter()
+    candidates = index.get_candidates(term, contiguous=max_distance == 0)
+    index_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    if candidates is None: candidates = range(len(texts))
+    n_matches = sum(
+        1 for doc_id in candidates
+        if fuzzy.match(term, texts[doc_id], max_distance)
+    )
+    match_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    n_scanned = sum(
+        1 for text in texts if fuzzy.match(term, text, max_distance)
+    )
+    scan_time = time.perf_counter() - started
+
+    if n_matches != n_scanned:
+        raise AssertionError('"%s": %i != %i' % (term, n_matches, n_scanned))
+
+    return (
+        len(candidates),
+        n_matches,
+        index_time * 1000,
+        match_time * 1000,
+        scan_time * 1000
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Search index benchmark')
+    synthetic_history.add_arguments(parser)
+    parser.add_argument('--sizes',
+        default=DEFAULT_SIZES,
+        help='Comma separated history sizes, overrides --size'
+    )
+    parser.add_argument('--max-distance',
+        type=int,
+        default=15,
+        help='Fuzzy search max distance, 0 - substring search'
+    )
+    parser.add_argument('--no-numpy',
+        action='store_true',
+        help='Check character masks without NumPy, as if it was missing'
+    )
+    args = parser.parse_args()
+    if args.no_numpy: char_masks.NUMPY_INSTALLED = False
+
+    for size in [int(size) for size in args.sizes.split(',') if size]:
+        # unique texts, so document ids are list positions
+        texts = [
+            text for kind, raw, text in synthetic_history.generate(
+                size,
+                args.mean_length,
+                args.distribution,
+                args.kinds,
+                args.seed
+            )
+        ]
+        index, build_time, memory = build(texts)
+
+        path = os.path.join(tempfile.mkdtemp(), 'search-index')
+        started = time.perf_counter()
+        index.save(path)
+        save_time = time.perf_counter() - started
+        started = time.perf_counter()
+        trigram_index.TrigramIndex.load(path)
+        load_time = time.perf_counter() - started
+
+        print(
+            '%i entries: build %.0f ms, %.1f MiB (%.0f bytes/entry), '
+            '%i postings, %i grams' % (
+                size,
+                build_time * 1000,
+                memory / 1024 / 1024,
+                memory / size,
+                index.get_size(),
+                len(index._postings)
+            )
+        )
+        print('saved %.1f MiB in %.0f ms, loaded in %.0f ms' % (
+            os.path.getsize(path) / 1024 / 1024,
+            save_time * 1000,
+            load_time * 1000
+        ))
+        os.remove(path)
+
+        print('%-16s %10s %8s %10s %10s %10s' % (
+            'query', 'candidates', 'matches', 'index ms', 'match ms', 'scan ms'
+        ))
+
+        for term in QUERIES:
+            print('%-16s %10i %8i %10.2f %10.1f %10.1f' % (
+                (term,) + measure_query(index, texts, term, args.max_distance)
+            ))
+
+        print()
+
+
+if __name__ == '__main__':
+    main()
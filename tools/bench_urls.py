@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+
+# Copyright 2016 Ivan awamper@gmail.com
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# Compares lib/urls.py with the extract_urls() it replaced on
+# synthetic clipboard corpora, and checks that both agree.
+
+import os
+import re
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import synthetic_history
+from draobpilc.lib import urls
+
+legacy_url_re = re.compile(r'^https?://\[?\w', re.IGNORECASE)
+legacy_url_2_re = re.compile(
+    r'^www\.|^(?!http)\w[^@]+\.(com|edu|gov|int|mil|net|org)($|/.*)$',
+    re.IGNORECASE
+)
+
+
+# extract_urls() before the rewrite
+def legacy_extract_urls(text):
+    def unescape(text, trail):
+        """
+        If input URL is HTML-escaped, unescape it so as we can safely feed it to
+        smart_urlquote. For example:
+        http://example.com?x=1&amp;y=&lt;2&gt; => http://example.com?x=1&y=<2>
+        """
+        unescaped = (text + trail).replace(
+            '&amp;', '&').replace('&lt;', '<').replace(
+            '&gt;', '>').replace('&quot;', '"').replace('&#39;', "'")
+        if trail and unescaped.endswith(trail):
+            # Remove trail for unescaped if it was not consumed by unescape
+            unescaped = unescaped[:-len(trail)]
+        elif trail == ';':
+            # Trail was consumed by unescape (as end-of-entity marker),
+            # move it to text
+            text += trail
+            trail = ''
+        return text, unescaped, trail
+
+    trailing_punctuation = ['.', ',', ':', ';', '.)', '"', '\'', '!']
+    wrapping_punctuation = [
+        ('(', ')'),
+        ('<', '>'),
+        ('[', ']'),
+        ('&lt;', '&gt;'),
+        ('"', '"'),
+        ('\'', '\'')
+    ]
+    word_split_re = re.compile(r'''([\s<>"']+)''')
+    result = []
+    words = word_split_re.split(text)
+
+    for i, word in enumerate(words):
+        if '.' in word or '@' in word or ':' in word:
+            # Deal with punctuation.
+            lead, middle, trail = '', word, ''
+
+            for punctuation in trailing_punctuation:
+                if middle.endswith(punctuation):
+                    middle = middle[:-len(punctuation)]
+                    trail = punctuation + trail
+
+            for opening, closing in wrapping_punctuation:
+                if middle.startswith(opening):
+                    middle = middle[len(opening):]
+                    lead = lead + opening
+
+                # Keep parentheses at the end only if they're balanced.
+                if (
+                    middle.endswith(closing)
+                    and middle.count(closing) == middle.count(opening) + 1
+                ):
+                    middle = middle[:-len(closing)]
+                    trail = closing + trail
+
+            url = None
+
+            if legacy_url_re.match(middle):
+                middle, middle_unescaped, trail = unescape(middle, trail)
+                url = middle_unescaped
+            elif legacy_url_2_re.match(middle):
+                middle, middle_unescaped, trail = unescape(middle, trail)
+                url = 'http://%s' % middle_unescaped
+
+            if url: result.append(url)
+
+    return result
+
+
+def legacy_is_url(string):
+    result = False
+    found = legacy_extract_urls(string)
+
+    if len(found) == 1 and len(found[0]) == len(string):
+        result = True
+
+    return result
+
+
+def get_corpora(args):
+    corpora = []
+
+    for name, kinds in (
+        ('mixed', synthetic_history.DEFAULT_KINDS),
+        ('plain text', 'text=1'),
+        ('links', 'link=1'),
+        ('files', 'file=1')
+    ):
+        entries = synthetic_history.generate(
+            args.size,
+            args.mean_length,
+            args.distribution,
+            kinds,
+            args.seed
+        )
+        corpora.append((name, [raw for kind, raw, text in entries]))
+
+    prose = synthetic_history.generate(
+        args.size // 10 or 1,
+        args.mean_length * 50,
+        args.distribution,
+        'text=1',
+        args.seed
+    )
+    corpora.append((
+        'long text with links',
+        [
+            '%s see https://example.com/page?id=%i&amp;x=1. %s' % (
+                raw[:len(raw) // 2],
+                i,
+                raw[len(raw) // 2:]
+            )
+            for i, (kind, raw, text) in enumerate(prose)
+        ]
+    ))
+
+    return corpora
+
+
+def measure(func, texts, repeat):
+    best = None
+
+    for i in range(repeat):
+        started = time.perf_counter()
+        for text in texts: func(text)
+        elapsed = time.perf_counter() - started
+        if best is None or elapsed < best: best = elapsed
+
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='URL extraction benchmark')
+    synthetic_history.add_arguments(parser)
+    parser.add_argument('--repeat',
+        type=int,
+        default=3,
+        help='Best of that many runs is reported'
+    )
+    args = parser.parse_args()
+
+    # the new is_url() is measured once, with an empty cache
+    print('%-24s %8s %12s %12s %12s %12s' % (
+        'corpus', 'entries', 'legacy ms', 'extract ms', 'is_url old', 'is_url new'
+    ))
+
+    for name, texts in get_corpora(args):
+        for text in texts:
+            if legacy_extract_urls(text) != urls.extract_urls(text):
+                raise AssertionError('Results differ for %r' % text[:200])
+
+        urls._is_url.cache_clear()
+        print('%-24s %8i %12.1f %12.1f %12.1f %12.1f' % (
+            name,
+            len(texts),
+            measure(legacy_extract_urls, texts, args.repeat) * 1000,
+            measure(urls.extract_urls, texts, args.repeat) * 1000,
+            measure(legacy_is_url, texts, args.repeat) * 1000,
+            measure(urls.is_url, texts, 1) * 1000
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+
+# Copyright 2016 Ivan awamper@gmail.com
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# Stand-in for the GPaste daemon implementing the part of the
+# org.gnome.GPaste1 interface used by draobpilc, with synthetic
+# histories. Run it on a private bus together with the app:
+#
+#   dbus-run-session -- sh -c \
+#       'tools/fake_gpaste_daemon.py --size 20000 & sleep 1; draobpilc -d'
+#
+# The GPaste GSettings schema (org.gnome.GPaste) still has to be
+# installed, draobpilc reads the GPaste shortcuts from it.
+
+import sys
+import argparse
+
+import dbus
+import dbus.service
+import dbus.lowlevel
+import dbus.mainloop.glib
+from gi.repository import GLib
+
+import synthetic_history
+
+BUS_NAME = 'org.gnome.GPaste'
+OBJECT_PATH = '/org/gnome/GPaste'
+IFACE = 'org.gnome.GPaste1'
+PROPERTIES_IFACE = 'org.freedesktop.DBus.Properties'
+VERSION = '3.18.3'
+DEFAULT_HISTORY = 'history'
+
+REPLACE = 'REPLACE'
+REMOVE = 'REMOVE'
+ALL = 'ALL'
+POSITION = 'POSITION'
+
+
+class FakeGPaste(dbus.service.Object):
+
+    def __init__(self, bus, histories, max_history_size=0):
+        super().__init__(bus, OBJECT_PATH)
+
+        self._bus = bus
+        # name -> list of (kind, raw, text), index 0 is the newest
+        self._histories = histories
+        self._name = DEFAULT_HISTORY
+        self._active = True
+        self._max_history_size = max_history_size
+        self._added = 0
+
+        if self._name not in self._histories: self._histories[self._name] = []
+
+    @property
+    def _history(self):
+        return self._histories[self._name]
+
+    def _get(self, index):
+        try:
+            return self._history[int(index)]
+        except IndexError:
+            raise dbus.exceptions.DBusException(
+                'Invalid index %i' % index,
+                name=IFACE + '.Error.InvalidIndex'
+            )
+
+    def _push(self, kind, raw, text):
+        history = self._history
+
+        for i, entry in enumerate(history):
+            if entry[1] != raw: continue
+            history.pop(i)
+            break
+
+        history.insert(0, (kind, raw, text))
+        if self._max_history_size: del history[self._max_history_size:]
+
+        self.Update(REPLACE, ALL, 0)
+
+    def _emit(self, name, signature, *args):
+        # for signals sharing their name with a method,
+        # dbus.service can't declare both on one object
+        message = dbus.lowlevel.SignalMessage(OBJECT_PATH, IFACE, name)
+        message.append(signature=signature, *args)
+        self._bus.send_message(message)
+
+    def add_synthetic(self, count):
+        entries = synthetic_history.generate(
+            count,
+            seed=self._added + len(self._history)
+        )
+
+        for kind, raw, text in entries:
+            self._added += 1
+            raw = 'burst %i: %s' % (self._added, raw)
+            if kind == synthetic_history.TEXT: text = raw
+            self._push(kind, raw, text)
+
+    # properties
+
+    @dbus.service.method(PROPERTIES_IFACE, in_signature='ss', out_signature='v')
+    def Get(self, interface, name):
+        return self.GetAll(interface)[name]
+
+    @dbus.service.method(PROPERTIES_IFACE, in_signature='s', out_signature='a{sv}')
+    def GetAll(self, interface):
+        return {
+            'Active': dbus.Boolean(self._active),
+            'Version': dbus.String(VERSION)
+        }
+
+    # methods
+
+    @dbus.service.method(IFACE, in_signature='', out_signature='as')
+    def GetHistory(self):
+        return [text for kind, raw, text in self._history]
+
+    @dbus.service.method(IFACE, in_signature='', out_signature='as')
+    def GetRawHistory(self):
+        return [raw for kind, raw, text in self._history]
+
+    @dbus.service.method(IFACE, in_signature='t', out_signature='s')
+    def GetElement(self, index):
+        return self._get(index)[2]
+
+    @dbus.service.method(IFACE, in_signature='t', out_signature='s')
+    def GetRawElement(self, index):
+        return self._get(index)[1]
+
+    @dbus.service.method(IFACE, in_signature='t', out_signature='s')
+    def GetElementKind(self, index):
+        return self._get(index)[0]
+
+    @dbus.service.method(IFACE, in_signature='t', out_signature='')
+    def Select(self, index):
+        entry = self._get(index)
+        self._push(*entry)
+
+    @dbus.service.method(IFACE, in_signature='ts', out_signature='')
+    def Replace(self, index, contents):
+        kind, raw, text = self._get(index)
+        if kind != synthetic_history.TEXT: return
+
+        self._history[int(index)] = (kind, str(contents), str(contents))
+        self.Update(REPLACE, POSITION, index)
+
+    @dbus.service.method(IFACE, in_signature='t', out_signature='')
+    def Delete(self, index):
+        self._get(index)
+        del self._history[int(index)]
+        self.Update(REMOVE, POSITION, index)
+
+    @dbus.service.method(IFACE, in_signature='s', out_signature='')
+    def Add(self, text):
+        self._push(synthetic_history.TEXT, str(text), str(text))
+
+    @dbus.service.method(IFACE, in_signature='', out_signature='as')
+    def ListHistories(self):
+        return list(self._histories.keys())
+
+    @dbus.service.method(IFACE, in_signature='s', out_signature='t')
+    def GetHistorySize(self, name):
+        return len(self._histories.get(str(name), []))
+
+    @dbus.service.method(IFACE, in_signature='', out_signature='s')
+    def GetHistoryName(self):
+        return self._name
+
+    @dbus.service.method(IFACE, in_signature='s', out_signature='')
+    def SwitchHistory(self, name):
+        self._name = str(name)
+        if self._name not in self._histories: self._histories[self._name] = []
+
+        self._emit('SwitchHistory', 's', self._name)
+        self.Update(REPLACE, ALL, 0)
+
+    @dbus.service.method(IFACE, in_signature='s', out_signature='')
+    def DeleteHistory(self, name):
+        name = str(name)
+        if name not in self._histories: return
+
+        if name == self._name:
+            self._histories[name] = []
+            self.Update(REMOVE, ALL, 0)
+        else:
+            del self._histories[name]
+
+        self._emit('DeleteHistory', 's', name)
+
+    @dbus.service.method(IFACE, in_signature='s', out_signature='')
+    def EmptyHistory(self, name):
+        name = str(name)
+        self._histories[name] = []
+        if name == self._name: self.Update(REMOVE, ALL, 0)
+
+    @dbus.service.method(IFACE, in_signature='ss', out_signature='')
+    def BackupHistory(self, history, backup):
+        self._histories[str(backup)] = list(
+            self._histories.get(str(history), [])
+        )
+
+    @dbus.service.method(IFACE, in_signature='b', out_signature='')
+    def Track(self, state):
+        self._active = bool(state)
+        self.Tracking(self._active)
+
+    @dbus.service.method(IFACE, in_signature='', out_signature='')
+    def Reexecute(self):
+        pass
+
+    # not part of GPaste, lets benchmarks trigger update bursts
+    @dbus.service.method(IFACE, in_signature='u', out_signature='')
+    def FakeAddBurst(self, count):
+        self.add_synthetic(int(count))
+
+    # signals
+
+    @dbus.service.signal(IFACE, signature='sst')
+    def Update(self, action, target, index):
+        pass
+
+    @dbus.service.signal(IFACE, signature='')
+    def ShowHistory(self):
+        pass
+
+    @dbus.service.signal(IFACE, signature='b')
+    def Tracking(self, state):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake GPaste daemon')
+    synthetic_history.add_arguments(parser)
+    parser.add_argument('--histories',
+        type=int,
+        default=1,
+        help='Number of histories, extra ones are named "history-N"'
+    )
+    parser.add_argument('--max-history-size',
+        type=int,
+        default=0,
+        help='Trim the history like GPaste does (0 - no limit)'
+    )
+    parser.add_argument('--burst',
+        type=int,
+        default=0,
+        help='Add that many entries every --burst-interval-ms'
+    )
+    parser.add_argument('--burst-interval-ms',
+        type=int,
+        default=5000
+    )
+    parser.add_argument('--show-history-after-ms',
+        type=int,
+        default=0,
+        help='Emit ShowHistory once after startup'
+    )
+    parser.add_argument('--bus-name',
+        default=BUS_NAME
+    )
+    args = parser.parse_args()
+
+    histories = {}
+
+    for i in range(args.histories):
+        name = DEFAULT_HISTORY if i == 0 else 'history-%i' % i
+        histories[name] = synthetic_history.generate(
+            args.size,
+            args.mean_length,
+            args.distribution,
+            args.kinds,
+            args.seed + i
+        )
+
+    dbus.mainloop.glib.DBusGMainLoop(set_as_default=True)
+    bus = dbus.SessionBus()
+    bus_name = dbus.service.BusName(args.bus_name, bus, do_not_queue=True)
+    daemon = FakeGPaste(bus, histories, args.max_history_size)
+
+    def on_burst():
+        daemon.add_synthetic(args.burst)
+        return GLib.SOURCE_CONTINUE
+
+    def on_show_history():
+        daemon.ShowHistory()
+        return GLib.SOURCE_REMOVE
+
+    if args.burst:
+        GLib.timeout_add(args.burst_interval_ms, on_burst)
+    if args.show_history_after_ms:
+        GLib.timeout_add(args.show_history_after_ms, on_show_history)
+
+    print(
+        'Fake GPaste on %s: %i histories of %i entries' % (
+            args.bus_name,
+            args.histories,
+            args.size
+        ),
+        file=sys.stderr
+    )
+
+    try:
+        GLib.MainLoop().run()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
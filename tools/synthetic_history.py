@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+
+# Copyright 2016 Ivan awamper@gmail.com
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# Synthetic clipboard histories shared by the fake GPaste daemon
+# and the benchmarks in this directory.
+
+import math
+import bisect
+import random
+import itertools
+
+# GPaste element kinds, "Link" is not a GPaste kind: links are "Text"
+# elements that draobpilc recognizes on its own
+TEXT = 'Text'
+LINK = 'Link'
+FILE = 'Uris'
+IMAGE = 'Image'
+
+DEFAULT_KINDS = 'text=80,link=10,file=6,image=4'
+DISTRIBUTIONS = ('fixed', 'uniform', 'lognormal')
+
+WORDS = (
+    'the', 'clipboard', 'history', 'python', 'return', 'self', 'import',
+    'error', 'value', 'None', 'def', 'class', 'lorem', 'ipsum', 'dolor',
+    'sit', 'amet', 'password', 'token', 'ssh', 'git', 'commit', 'branch',
+    'deploy', 'server', 'config', 'tmp', 'user', 'main', 'test', 'föö',
+    'naïve', 'café', 'Straße', '42', '2016', 'TODO', 'FIXME', '->', '{}'
+)
+HOSTS = (
+    'example.com', 'github.com', 'docs.python.org', 'wiki.gnome.org',
+    'www.kernel.org', 'stackoverflow.com', 'news.ycombinator.com'
+)
+
+
+def parse_kinds(spec):
+    names = {'text': TEXT, 'link': LINK, 'file': FILE, 'image': IMAGE}
+    result = {}
+
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip().lower()
+
+        if name not in names:
+            raise ValueError('Unknown kind "%s"' % name)
+
+        result[names[name]] = float(weight or 1)
+
+    return result
+
+
+def get_length(rand, mean_length, distribution):
+    if distribution == 'fixed':
+        return mean_length
+    elif distribution == 'uniform':
+        return rand.randint(1, mean_length * 2)
+    elif distribution == 'lognormal':
+        sigma = 1.0
+        mu = math.log(mean_length) - sigma ** 2 / 2
+        return max(1, int(rand.lognormvariate(mu, sigma)))
+    else:
+        raise ValueError('Unknown distribution "%s"' % distribution)
+
+
+def make_text(rand, length):
+    words = []
+    size = 0
+
+    while size < length:
+        word = rand.choice(WORDS)
+        if rand.random() < 0.08: word += '\n'
+        words.append(word)
+        size += len(word) + 1
+
+    return ' '.join(words)[:length]
+
+
+def make_link(rand, number):
+    return 'https://%s/%s/%i' % (
+        rand.choice(HOSTS),
+        rand.choice(WORDS[:30]),
+        number
+    )
+
+
+def make_entry(rand, kind, number, mean_length, distribution):
+    if kind == LINK:
+        raw = make_link(rand, number)
+        return TEXT, raw, raw
+    elif kind == FILE:
+        n_files = 1 if rand.random() < 0.8 else rand.randint(2, 5)
+        raw = '\n'.join(
+            '/tmp/draobpilc-synthetic/file-%i-%i.txt' % (number, i)
+            for i in range(n_files)
+        )
+        return FILE, raw, '[Files] ' + raw
+    elif kind == IMAGE:
+        raw = '/tmp/draobpilc-synthetic/image-%i.png' % number
+        return IMAGE, raw, '[Image, 640 x 480 (%i)]' % number
+    else:
+        length = get_length(rand, mean_length, distribution)
+        text = make_text(rand, length)
+        # keep text entries unique like GPaste does
+        raw = '%s %i' % (text, number)
+        return TEXT, raw, raw
+
+
+def generate(
+    size,
+    mean_length=80,
+    distribution='lognormal',
+    kinds=DEFAULT_KINDS,
+    seed=0
+):
+    """ returns a list of (gpaste kind, raw, text) tuples """
+    rand = random.Random(seed)
+    if isinstance(kinds, str): kinds = parse_kinds(kinds)
+
+    names = sorted(kinds.keys())
+    cumulative = list(itertools.accumulate(kinds[name] for name in names))
+    result = []
+
+    for number in range(size):
+        point = rand.random() * cumulative[-1]
+        kind = names[bisect.bisect_right(cumulative, point)]
+        result.append(
+            make_entry(rand, kind, number, mean_length, distribution)
+        )
+
+    return result
+
+
+def add_arguments(parser):
+    parser.add_argument('--size',
+        type=int,
+        default=1000,
+        help='Number of entries in the generated history'
+    )
+    parser.add_argument('--mean-length',
+        type=int,
+        default=80,
+        help='Mean length of text entries'
+    )
+    parser.add_argument('--distribution',
+        choices=DISTRIBUTIONS,
+        default='lognormal',
+        help='Length distribution of text entries'
+    )
+    parser.add_argument('--kinds',
+        default=DEFAULT_KINDS,
+        help='Kind mix, e.g. "%s"' % DEFAULT_KINDS
+    )
+    parser.add_argument('--seed',
+        type=int,
+        default=0
+    )